@@ -1,14 +1,21 @@
+import time
+_import_started = time.perf_counter()
+
+import os
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from datetime import datetime
 
+from app.services.replica import RoutingSession, replica_router
+from app.services.startup import StartupProfile
+
+_import_seconds = time.perf_counter() - _import_started
+
 # Initialize extensions
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 socketio = SocketIO()
 
@@ -18,6 +25,7 @@ def log_api_call():
 
 def create_app(config_object=None):
     """Application factory pattern"""
+    profile = StartupProfile(import_seconds=_import_seconds)
     app = Flask(__name__)
     
     # Load configuration
@@ -27,12 +35,85 @@ def create_app(config_object=None):
         # Default to using config.py
         from config import get_config
         app.config.from_object(get_config())
+    profile.mark('config')
+    
+    # Let psycopg2 cooperate with gevent before any connection is opened
+    if app.config.get('DB_GEVENT_WAIT_CALLBACK') and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+        from app.services.db_pool import make_psycopg_green
+        make_psycopg_green()
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
     jwt.init_app(app)
     
+    # Flask-Migrate pulls in Alembic, which only the flask CLI needs
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
+    # Connection pool utilisation metrics
+    from app.services import metrics
+    from app.services.db_pool import install_pool_listeners, pool_metrics
+    install_pool_listeners()
+    metrics.register_provider('db_pool', lambda: pool_metrics(db))
+    
+    # Read replica routing for views marked with use_replica
+    replica_router.init_app(app)
+    metrics.register_provider('replica', replica_router.metrics)
+    
+    # Identity cache for user lookups on authenticated hot paths
+    from app.services.user_cache import user_cache
+    user_cache.init_app(app)
+    metrics.register_provider('user_cache', user_cache.metrics)
+    
+    # Conditional GET support and compression of large responses
+    from app.services import http_cache
+    http_cache.init_app(app)
+    
+    # Rate limiting and load shedding for location ingest
+    from app.services.rate_limit import rate_limiter, admission
+    rate_limiter.init_app(app)
+    admission.init_app(app)
+    metrics.register_provider('rate_limit', rate_limiter.metrics)
+    metrics.register_provider('admission', admission.metrics)
+    
+    # Sequenced broadcasts with replay for resuming sockets
+    from app.services.broadcast import room_log
+    room_log.init_app(app)
+    metrics.register_provider('broadcast', room_log.metrics)
+    
+    # Reporting interval recommendations pushed to clients
+    from app.services.rate_hints import rate_hints
+    rate_hints.init_app(app)
+    metrics.register_provider('rate_hints', rate_hints.metrics)
+    
+    # Storage backend for location history (SQL rows or track log files)
+    from app.services.location_store import location_store
+    location_store.init_app(app)
+    
+    # Density heatmap tiles, evicted when new fixes land in them
+    from app.services.heatmap import heatmap_tiles
+    heatmap_tiles.init_app(app)
+    metrics.register_provider('heatmap', heatmap_tiles.metrics)
+    
+    # Durable queue between web workers and the ingest process (INGEST_MODE=queue)
+    from app.services.ingest_queue import ingest_queue
+    ingest_queue.init_app(app)
+    if app.config.get('INGEST_MODE') == 'queue':
+        metrics.register_provider('ingest_queue', ingest_queue.metrics)
+    
+    # Query counts, N+1 and slow statement detection per request (development)
+    if app.config.get('QUERY_PROFILE'):
+        from app.services.query_profile import query_profiler
+        query_profiler.init_app(app)
+        metrics.register_provider('query_profile', query_profiler.metrics)
+    
+    # Retention policies, run by `flask prune` or every RETENTION_INTERVAL seconds
+    from app.services.retention import retention
+    retention.init_app(app)
+    metrics.register_provider('retention', retention.metrics)
+    profile.mark('extensions')
+    
     # Setup CORS
     CORS(app, resources={r"/api/*": {"origins": "*", "supports_credentials": True, "allow_headers": ["Content-Type", "Authorization"]}}, expose_headers=["Authorization"])
     
@@ -43,12 +124,14 @@ def create_app(config_object=None):
     
     # Initialize SocketIO
     socketio.init_app(app, cors_allowed_origins="*", async_mode='gevent')
+    profile.mark('socketio')
     
     # Register blueprints
     from app.api.auth import auth_bp
     from app.api.users import users_bp
     from app.api.locations import locations_bp
     from app.api.admin import admin_bp
+    from app.api.groups import groups_bp
     
     # Add a debug endpoint to print headers
     @app.route('/api/debug/headers')
@@ -64,14 +147,37 @@ def create_app(config_object=None):
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(locations_bp, url_prefix='/api/locations')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(groups_bp, url_prefix='/api/groups')
     
     # Setup socket.io events
     from app.sockets import register_socket_events
     register_socket_events(socketio)
+    profile.mark('blueprints')
+    
+    # Schema creation is a deploy step (flask create-schema); development
+    # setups can still create tables on boot
+    if app.config.get('AUTO_CREATE_SCHEMA', True):
+        with app.app_context():
+            db.create_all(bind_key=None)
+        profile.mark('create_schema')
+    
+    @app.cli.command('create-schema')
+    def create_schema():
+        """Create database tables and indexes that don't exist yet"""
+        db.create_all(bind_key=None)
+        # create_all skips indexes added to models whose tables already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        print("Database schema created")
     
-    # Create database tables if they don't exist (development only)
-    with app.app_context():
-        db.create_all()
+    @app.cli.command('prune')
+    def prune():
+        """Apply the location and unverified user retention policies once"""
+        result = retention.run()
+        print(f"Pruned {result['locations']} locations and {result['unverified_users']} unverified users")
+    
+    retention.start(app)
     
     # Add before_request handler for logging
     app.before_request(log_api_call)
@@ -88,4 +194,9 @@ def create_app(config_object=None):
             headers['Access-Control-Allow-Credentials'] = 'true'
             return response
     
+    profile.mark('finalize')
+    metrics.register_provider('startup', profile.report)
+    if app.config.get('STARTUP_PROFILE'):
+        print(profile.format())
+    
     return app
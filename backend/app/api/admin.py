@@ -1,9 +1,19 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt
 from marshmallow import ValidationError
 
 from app.models.user import User, UserSchema
-from app import db
+from app.models.group import Group, GroupMembership, GroupSchema
+from app import db, socketio
+from app.services import metrics
+from app.services.replica import use_replica
+from app.services.user_cache import user_cache
+from app.services.http_cache import conditional
+from app.services.retention import purge_users
+from app.services.heatmap import heatmap_tiles
+from app.api.locations import parse_time_range
+from app.services.groups import group_room
+from app.sockets import sync_broadcast_rooms
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -18,9 +28,16 @@ def require_admin(fn):
     wrapper.__name__ = fn.__name__
     return wrapper
 
+def users_version():
+    """Validator for the admin user listing"""
+    count, max_id, updated_at = User.table_version()
+    return (count, max_id, str(updated_at)), updated_at
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 @require_admin
+@use_replica
+@conditional(users_version)
 def get_all_users():
     """Get all users with detailed information"""
     try:
@@ -45,6 +62,7 @@ def approve_user(user_id):
         
         user.is_approved = True
         db.session.commit()
+        user_cache.invalidate(user_id)
         
         return jsonify({
             'message': f'User {user.email} approved successfully',
@@ -68,6 +86,7 @@ def toggle_active(user_id):
         # Toggle active status
         user.is_active = not user.is_active
         db.session.commit()
+        user_cache.invalidate(user_id)
         
         status = "activated" if user.is_active else "deactivated"
         
@@ -92,11 +111,160 @@ def delete_user(user_id):
         
         email = user.email
         
-        # Delete all related records like locations
-        db.session.delete(user)
+        # Set-based deletes of locations and memberships, nothing is loaded
+        purge_users([user.id])
         db.session.commit()
+        user_cache.invalidate(user_id)
         
         return jsonify({'message': f'User {email} deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Failed to delete user', 'error': str(e)}), 500
+
+
+@admin_bp.route('/groups', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_all_groups():
+    """Get all groups with their member counts"""
+    try:
+        groups = Group.query.options(db.selectinload(Group.memberships)).order_by(Group.name).all()
+        return jsonify(GroupSchema(many=True).dump(groups)), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch groups', 'error': str(e)}), 500
+
+@admin_bp.route('/groups', methods=['POST'])
+@jwt_required()
+@require_admin
+def create_group():
+    """Create a new group"""
+    try:
+        data = GroupSchema().load(request.json or {})
+        
+        if Group.query.filter_by(name=data['name']).first():
+            return jsonify({'message': 'Group name already exists'}), 409
+        
+        group = Group(name=data['name'], description=data.get('description'))
+        db.session.add(group)
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'Group {group.name} created successfully',
+            'group': GroupSchema().dump(group)
+        }), 201
+    except ValidationError as err:
+        return jsonify({'message': 'Validation error', 'errors': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to create group', 'error': str(e)}), 500
+
+@admin_bp.route('/groups/<int:group_id>', methods=['DELETE'])
+@jwt_required()
+@require_admin
+def delete_group(group_id):
+    """Delete a group and its memberships"""
+    try:
+        group = db.session.get(Group, group_id)
+        
+        if not group:
+            return jsonify({'message': 'Group not found'}), 404
+        
+        name = group.name
+        member_ids = [m.user_id for m in group.memberships]
+        db.session.delete(group)
+        db.session.commit()
+        socketio.close_room(group_room(group_id))
+        for member_id in member_ids:
+            user_cache.invalidate(member_id)
+            sync_broadcast_rooms(socketio, member_id)
+        
+        return jsonify({'message': f'Group {name} deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to delete group', 'error': str(e)}), 500
+
+@admin_bp.route('/groups/<int:group_id>/members/<int:user_id>', methods=['PUT'])
+@jwt_required()
+@require_admin
+def add_group_member(group_id, user_id):
+    """Add a user to a group"""
+    try:
+        group = db.session.get(Group, group_id)
+        user = db.session.get(User, user_id)
+        
+        if not group or not user:
+            return jsonify({'message': 'Group or user not found'}), 404
+        
+        if not GroupMembership.query.filter_by(group_id=group_id, user_id=user_id).first():
+            db.session.add(GroupMembership(group_id=group_id, user_id=user_id))
+            db.session.commit()
+            user_cache.invalidate(user_id)
+            sync_broadcast_rooms(socketio, user_id)
+        
+        return jsonify({'message': f'User {user.email} added to {group.name}'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to add group member', 'error': str(e)}), 500
+
+@admin_bp.route('/groups/<int:group_id>/members/<int:user_id>', methods=['DELETE'])
+@jwt_required()
+@require_admin
+def remove_group_member(group_id, user_id):
+    """Remove a user from a group"""
+    try:
+        membership = GroupMembership.query.filter_by(group_id=group_id, user_id=user_id).first()
+        
+        if not membership:
+            return jsonify({'message': 'Membership not found'}), 404
+        
+        db.session.delete(membership)
+        db.session.commit()
+        user_cache.invalidate(user_id)
+        # Stop live updates of the group to the removed member's open sockets
+        sync_broadcast_rooms(socketio, user_id)
+        
+        return jsonify({'message': 'User removed from group successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to remove group member', 'error': str(e)}), 500
+
+@admin_bp.route('/heatmap/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_heatmap_tile(z, x, y):
+    """Get a density tile of all locations, or of one group's members with ?group_id="""
+    try:
+        if not 0 <= z <= heatmap_tiles.max_zoom or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'message': 'Tile out of range'}), 404
+        start, end = parse_time_range()
+        
+        user_ids, scope = None, None
+        group_id = request.args.get('group_id', type=int)
+        if group_id is not None:
+            if not db.session.get(Group, group_id):
+                return jsonify({'message': 'Group not found'}), 404
+            user_ids = [user_id for (user_id,) in db.session.query(GroupMembership.user_id)
+                        .filter_by(group_id=group_id).order_by(GroupMembership.user_id)]
+            # Membership changes give the group a new cache scope
+            scope = ('group', group_id, tuple(user_ids))
+        
+        png = heatmap_tiles.tile(z, x, y, user_ids, start, end, scope=scope)
+        response = Response(png, mimetype='image/png')
+        # Tiles change as fixes arrive: revalidate every time, answering with a 304 when unchanged
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
+    except ValueError as e:
+        return jsonify({'message': 'Invalid time range', 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to render heatmap tile', 'error': str(e)}), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_metrics():
+    """Get runtime metrics for this worker process"""
+    try:
+        return jsonify(metrics.collect()), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to collect metrics', 'error': str(e)}), 500
@@ -7,7 +7,7 @@ import bcrypt
 
 from app.models.user import User, UserSchema
 from app import db
-from app.services.email import send_verification_email
+from app.services.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -46,8 +46,10 @@ def register():
         # Save to database
         db.session.add(new_user)
         db.session.commit()
+        user_cache.invalidate(new_user.id)
         
-        # Send verification email
+        # Send verification email (the email service is loaded on first use)
+        from app.services.email import send_verification_email
         send_verification_email(new_user.email, verification_token)
         
         return jsonify({'message': 'Registration successful. Please check your email to verify your account.'}), 201
@@ -156,6 +158,7 @@ def verify_email_token(token):
         user.verification_token = None
         user.token_expiry = None
         db.session.commit()
+        user_cache.invalidate(user.id)
         return "<h2>Email verified successfully. Your account is now pending admin approval.</h2>", 200
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.models.group import Group, GroupMembership, GroupSchema
+from app.models.user import User, UserSchema
+from app import db
+from app.services.user_cache import user_cache
+
+groups_bp = Blueprint('groups', __name__)
+
+@groups_bp.route('', methods=['GET'])
+@jwt_required()
+def get_my_groups():
+    """Get the groups the current user belongs to"""
+    try:
+        user = user_cache.get(get_jwt_identity())
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        
+        groups = Group.query.filter(Group.id.in_(user.group_ids))\
+            .options(db.selectinload(Group.memberships))\
+            .order_by(Group.name).all()
+        return jsonify(GroupSchema(many=True).dump(groups)), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch groups', 'error': str(e)}), 500
+
+
+@groups_bp.route('/<int:group_id>/members', methods=['GET'])
+@jwt_required()
+def get_group_members(group_id):
+    """Get the members of a group the current user belongs to"""
+    try:
+        user = user_cache.get(get_jwt_identity())
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        if user.role != 'admin' and group_id not in user.group_ids:
+            return jsonify({'message': 'Unauthorized access'}), 403
+        
+        members = User.query.join(GroupMembership, GroupMembership.user_id == User.id)\
+            .filter(GroupMembership.group_id == group_id)\
+            .order_by(User.name)\
+            .all()
+        return jsonify(UserSchema(many=True).dump(members)), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch group members', 'error': str(e)}), 500
@@ -1,64 +1,114 @@
-from flask import Blueprint, jsonify, request
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 
-from app.models.location import Location, LocationSchema
+from app.models.location import LocationSchema, LocationFixSchema
 from app.models.user import User
 from app import db, socketio
+from app.services.replica import use_replica
+from app.services.user_cache import user_cache
+from app.services.http_cache import conditional
+from app.services.rate_limit import limit_ingest
+from app.services.broadcast import room_log
+from app.services.ingest_queue import ingest_queue
+from app.services.groups import broadcast_rooms, require_visible_user
+from app.services.location_store import location_store
+from app.services.rate_hints import rate_hints
 
 locations_bp = Blueprint('locations', __name__)
 
+def latest_location_version(user_id):
+    """Validator for a user's latest location"""
+    return location_store.latest_version(user_id)
+
+def parse_time_range():
+    """Optional ISO 8601 start/end query parameters as naive UTC datetimes"""
+    bounds = []
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            # fromisoformat only accepts the 'Z' suffix from Python 3.11 on
+            if value.endswith(('Z', 'z')):
+                value = value[:-1] + '+00:00'
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            value = parsed
+        bounds.append(value)
+    return bounds
+
 @locations_bp.route('', methods=['POST'])
 @jwt_required()
+@limit_ingest
 def add_location():
     """Add a new location for the current user"""
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = user_cache.get(user_id)
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
         
-        # Parse location data
-        data = request.json
-        lat = data.get('lat')
-        lng = data.get('lng')
-        accuracy = data.get('accuracy')
-        altitude = data.get('altitude')
-        speed = data.get('speed')
-        heading = data.get('heading')
+        # Parse and validate location data
+        fix = LocationFixSchema().load(request.json or {})
+        lat = fix['lat']
+        lng = fix['lng']
+        accuracy = fix.get('accuracy')
+        timestamp = datetime.utcnow()
         
-        # Create new location
-        new_location = Location(
-            user_id=user_id,
-            latitude=lat,
-            longitude=lng,
-            accuracy=accuracy,
-            altitude=altitude,
-            speed=speed,
-            heading=heading
-        )
-        
-        # Save to database
-        db.session.add(new_location)
-        db.session.commit()
-        
-        # Update user status to active
-        if not user.is_active:
-            user.is_active = True
+        if current_app.config.get('INGEST_MODE') == 'queue':
+            # Hand the fix to the ingest process through the durable local queue
+            ingest_queue.put({
+                'user_id': user.id,
+                'latitude': lat,
+                'longitude': lng,
+                'accuracy': accuracy,
+                'altitude': fix.get('altitude'),
+                'speed': fix.get('speed'),
+                'heading': fix.get('heading'),
+                'timestamp': timestamp.isoformat()
+            })
+            status, message = 202, 'Location accepted'
+        else:
+            # Store the location, marking the user active in the same transaction
+            location_store.add({
+                'user_id': user.id,
+                'latitude': lat,
+                'longitude': lng,
+                'accuracy': accuracy,
+                'altitude': fix.get('altitude'),
+                'speed': fix.get('speed'),
+                'heading': fix.get('heading'),
+                'timestamp': timestamp
+            })
+            if not user.is_active:
+                User.query.filter_by(id=user.id).update({'is_active': True})
             db.session.commit()
+            
+            if not user.is_active:
+                user_cache.invalidate(user.id)
+            status, message = 201, 'Location updated successfully'
         
-        # Emit location update via SocketIO
-        socketio.emit('location_update', {
+        # Emit location update to the user's group rooms, sequenced for resume
+        location_data = {
             'userId': user_id,
             'lat': lat,
             'lng': lng,
             'accuracy': accuracy,
-            'timestamp': new_location.timestamp.isoformat()
-        })
+            'timestamp': timestamp.isoformat()
+        }
+        for room in broadcast_rooms(user):
+            room_log.publish(socketio, room, 'location_update', location_data)
         
-        return jsonify({'message': 'Location updated successfully'}), 201
+        # REST clients get the recommended reporting interval in the response
+        hint = rate_hints.hint(socketio, user.id, broadcast_rooms(user), speed=fix.get('speed'))
+        
+        return jsonify({'message': message, 'rate_hint': hint}), status
     
+    except ValidationError as err:
+        return jsonify({'message': 'Validation error', 'errors': err.messages}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Failed to update location', 'error': str(e)}), 500
@@ -66,6 +116,8 @@ def add_location():
 
 @locations_bp.route('/user/<int:user_id>', methods=['GET'])
 @jwt_required()
+@require_visible_user
+@use_replica
 def get_user_locations(user_id):
     """Get location history for a specific user"""
     try:
@@ -74,15 +126,13 @@ def get_user_locations(user_id):
         per_page = request.args.get('per_page', 100, type=int)
         
         # Get locations with pagination
-        locations = Location.query.filter_by(user_id=user_id)\
-            .order_by(Location.timestamp.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        items, total = location_store.history(user_id, page, per_page)
         
         schema = LocationSchema(many=True)
         result = {
-            'locations': schema.dump(locations.items),
-            'total': locations.total,
-            'pages': locations.pages,
+            'locations': schema.dump(items),
+            'total': total,
+            'pages': -(-total // per_page) if per_page > 0 else 0,
             'current_page': page
         }
         
@@ -94,12 +144,12 @@ def get_user_locations(user_id):
 
 @locations_bp.route('/latest/<int:user_id>', methods=['GET'])
 @jwt_required()
+@require_visible_user
+@conditional(latest_location_version)
 def get_latest_location(user_id):
     """Get the latest location for a specific user"""
     try:
-        location = Location.query.filter_by(user_id=user_id)\
-            .order_by(Location.timestamp.desc())\
-            .first()
+        location = location_store.latest(user_id)
         
         if not location:
             return jsonify({'message': 'No locations found for this user'}), 404
@@ -111,3 +161,46 @@ def get_latest_location(user_id):
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch location', 'error': str(e)}), 500
+
+
+@locations_bp.route('/user/<int:user_id>/export', methods=['GET'])
+@jwt_required()
+@require_visible_user
+@use_replica
+def export_user_locations(user_id):
+    """Export the location history of a user as CSV"""
+    try:
+        start, end = parse_time_range()
+    except ValueError:
+        return jsonify({'message': 'Invalid start or end time'}), 400
+    
+    columns = ('timestamp', 'latitude', 'longitude', 'altitude', 'accuracy', 'speed', 'heading')
+    
+    def generate():
+        yield ','.join(columns) + '\n'
+        for point in location_store.iter_range(user_id, start, end):
+            values = [point.timestamp.isoformat()] + [getattr(point, column) for column in columns[1:]]
+            yield ','.join('' if value is None else str(value) for value in values) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=locations-{user_id}.csv'}
+    )
+
+
+@locations_bp.route('/user/<int:user_id>/stats', methods=['GET'])
+@jwt_required()
+@require_visible_user
+@use_replica
+def get_user_location_stats(user_id):
+    """Get summary statistics of the location history of a user"""
+    try:
+        start, end = parse_time_range()
+    except ValueError:
+        return jsonify({'message': 'Invalid start or end time'}), 400
+    
+    try:
+        return jsonify(location_store.stats(user_id, start, end)), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to compute location statistics', 'error': str(e)}), 500
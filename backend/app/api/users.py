@@ -4,9 +4,26 @@ from marshmallow import ValidationError
 
 from app.models.user import User, UserSchema
 from app import db
+from app.services.replica import use_replica
+from app.services.user_cache import user_cache
+from app.services.http_cache import conditional
+from app.services.groups import visible_users_filter
+from app.models.group import GroupMembership
 
 users_bp = Blueprint('users', __name__)
 
+def active_users_version():
+    """Validator for the active users list, which excludes the caller.
+    
+    Includes the (cached) groups the body is filtered by, so a stale cache
+    in this worker never pairs an old list with a new ETag.
+    """
+    count, max_id, updated_at = User.table_version()
+    memberships = GroupMembership.table_version()
+    viewer = user_cache.get(get_jwt_identity())
+    group_ids = viewer.group_ids if viewer else None
+    return (get_jwt_identity(), group_ids, count, max_id, str(updated_at), *memberships), updated_at
+
 @users_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
@@ -25,7 +42,7 @@ def get_current_user():
         # Convert string ID back to integer if needed
         try:
             user_id_int = int(user_id)
-            user = User.query.get(user_id_int)
+            user = user_cache.get(user_id_int)
         except (ValueError, TypeError):
             return jsonify({'message': 'Invalid user ID format'}), 400
         
@@ -42,14 +59,20 @@ def get_current_user():
 
 @users_bp.route('/active', methods=['GET'])
 @jwt_required()
+@conditional(active_users_version)
 def get_active_users():
     """Get list of active users (for the map view)"""
     try:
-        # Get all active users except the current user
+        # Get active users sharing a group with the current user, except themselves
         current_user_id = get_jwt_identity()
+        current_user = user_cache.get(current_user_id)
+        if not current_user:
+            return jsonify({'message': 'User not found'}), 404
+        
         active_users = User.query.filter(
             User.is_active == True,
-            User.id != current_user_id
+            User.id != current_user_id,
+            visible_users_filter(current_user)
         ).all()
         
         schema = UserSchema(many=True)
@@ -62,6 +85,7 @@ def get_active_users():
 
 @users_bp.route('/', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_all_users():
     """Admin only: Get all users"""
     try:
@@ -99,6 +123,7 @@ def approve_user(user_id):
         user.is_active = True
         
         db.session.commit()
+        user_cache.invalidate(user_id)
         
         return jsonify({'message': f'User {user.email} approved successfully'}), 200
     except Exception as e:
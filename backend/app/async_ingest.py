@@ -0,0 +1,325 @@
+# Optional asyncio ingest service: location POSTs and socket fan-out on an ASGI server
+import asyncio
+import json
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import socketio
+from flask_jwt_extended import decode_token
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from marshmallow import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models.group import GroupMembership
+from app.models.location import Location, LocationFixSchema
+from app.models.user import User
+from app.services.broadcast import room_log
+from app.services.groups import broadcast_rooms
+from app.services.rate_hints import rate_hints
+from app.services.rate_limit import RedisStorage, rate_limiter, admission
+from app.services.user_cache import CachedUser, user_cache
+
+USER_COLUMNS = [User.__table__.c[field] for field in CachedUser._fields if field != 'group_ids']
+
+def async_database_uri(uri):
+    """The async driver equivalent of a SQLAlchemy database URI"""
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    for prefix, driver in (('postgresql://', 'postgresql+asyncpg://'),
+                           ('postgresql+psycopg2://', 'postgresql+asyncpg://'),
+                           ('sqlite://', 'sqlite+aiosqlite://')):
+        if uri.startswith(prefix):
+            return driver + uri[len(prefix):]
+    return uri
+
+
+class AsyncIngestService:
+    """ASGI app serving POST /api/locations and the socket.io events.
+    
+    It reuses the Flask app for configuration, JWT validation, schemas and
+    the per-process services (rate limits, sequenced broadcasts, rate
+    hints) but talks to the database through an async driver, so a single
+    event loop holds many more connections than a gevent worker. Run it
+    as its own process (`uvicorn asgi:app`) and route location ingest and
+    /socket.io/ to it; clients connected here only see broadcasts sent by
+    this process. Only the SQL location backend with inline ingest is
+    supported.
+    """
+    
+    def __init__(self, flask_app):
+        config = flask_app.config
+        if config.get('LOCATION_BACKEND', 'sql') != 'sql' or config.get('INGEST_MODE', 'inline') != 'inline':
+            raise RuntimeError('The async ingest service requires LOCATION_BACKEND=sql and INGEST_MODE=inline')
+        
+        self.flask_app = flask_app
+        uri = config.get('ASYNC_DATABASE_URI') or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(uri, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        self.grace = config.get('SOCKET_RESUME_GRACE', 30)
+        self._connections = {}
+        
+        self.sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+        self._register_events()
+        self.app = socketio.ASGIApp(self.sio, other_asgi_app=self.http, on_shutdown=self.engine.dispose)
+    
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+    
+    def identity(self, token):
+        """User id of a valid access token, using the Flask app's JWT settings"""
+        with self.flask_app.app_context():
+            return decode_token(token)['sub']
+    
+    async def rate_limit(self, scope, key):
+        """rate_limiter.hit, moving shared (Redis) bucket round trips off the event loop"""
+        if isinstance(rate_limiter.storage, RedisStorage):
+            return await asyncio.to_thread(rate_limiter.hit, scope, key)
+        return rate_limiter.hit(scope, key)
+    
+    async def load_user(self, user_id):
+        user = user_cache.get_cached(user_id)
+        if user is not None:
+            return user
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(select(*USER_COLUMNS).where(User.id == int(user_id)))).first()
+            if row is None:
+                return None
+            group_ids = (await conn.execute(
+                select(GroupMembership.group_id)
+                .where(GroupMembership.user_id == int(user_id))
+                .order_by(GroupMembership.group_id)
+            )).scalars().all()
+        user = CachedUser(**row._mapping, group_ids=tuple(group_ids))
+        user_cache.put(user.id, user)
+        return user
+    
+    async def set_active(self, user, active):
+        async with self.engine.begin() as conn:
+            await conn.execute(update(User).where(User.id == user.id).values(is_active=active))
+        user_cache.invalidate(user.id)
+    
+    async def store(self, user, row):
+        """Insert a fix, marking the user active in the same transaction"""
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Location), [row])
+            if not user.is_active:
+                await conn.execute(update(User).where(User.id == user.id).values(is_active=True))
+        if not user.is_active:
+            user_cache.invalidate(user.id)
+    
+    async def publish(self, user, location_data, skip_sid=None):
+        rooms = broadcast_rooms(user)
+        for room in rooms:
+            message = room_log.record(room, 'location_update', location_data)
+            await self.sio.emit('location_update', message, to=room, skip_sid=skip_sid)
+        return rooms
+    
+    async def send_hint(self, user_id, rooms, speed=None):
+        hint, changed = rate_hints.update(user_id, rooms, speed)
+        if changed:
+            await self.sio.emit('rate_hint', hint, to=f'user_{user_id}')
+        return hint
+    
+    async def refresh_hints(self, user_ids):
+        for user_id in user_ids:
+            user = await self.load_user(user_id)
+            if user:
+                await self.send_hint(user_id, broadcast_rooms(user))
+    
+    # HTTP
+    
+    async def http(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        
+        method, path = scope['method'], scope['path'].rstrip('/')
+        if method == 'OPTIONS':
+            return await self._respond(send, 204, None)
+        if path == '/api/health' and method == 'GET':
+            return await self._respond(send, 200, {'status': 'healthy', 'message': 'Async ingest service is running'})
+        if path == '/api/locations' and method == 'POST':
+            body = b''
+            while True:
+                event = await receive()
+                body += event.get('body', b'')
+                if not event.get('more_body'):
+                    break
+            with admission.track():
+                status, payload, headers = await self.add_location(dict(scope['headers']), body)
+            return await self._respond(send, status, payload, headers)
+        return await self._respond(send, 404, {'message': 'Not found'})
+    
+    async def add_location(self, headers, body):
+        """The async counterpart of the REST add_location view; returns (status, payload, headers)"""
+        scheme, _, token = headers.get(b'authorization', b'').decode().partition(' ')
+        if scheme != 'Bearer' or not token:
+            return 401, {'msg': 'Missing Authorization Header'}, {}
+        try:
+            user_id = self.identity(token)
+        except ExpiredSignatureError:
+            # Same statuses as flask_jwt_extended, so clients refresh their token
+            return 401, {'msg': 'Token has expired'}, {}
+        except Exception as e:
+            return 422, {'msg': str(e)}, {}
+        
+        if admission.should_shed():
+            return 503, {'message': 'Server is busy, please retry later'}, {'Retry-After': '1'}
+        allowed, retry_after = await self.rate_limit('rest_user', user_id)
+        if not allowed:
+            return 429, {'message': 'Too many location updates', 'retry_after': round(retry_after, 2)}, \
+                {'Retry-After': str(max(1, int(retry_after + 0.999)))}
+        
+        try:
+            user = await self.load_user(user_id)
+            if not user:
+                return 404, {'message': 'User not found'}, {}
+            
+            fix = LocationFixSchema().load(json.loads(body or b'{}'))
+            timestamp = datetime.utcnow()
+            await self.store(user, {
+                'user_id': user.id,
+                'latitude': fix['lat'],
+                'longitude': fix['lng'],
+                'accuracy': fix.get('accuracy'),
+                'altitude': fix.get('altitude'),
+                'speed': fix.get('speed'),
+                'heading': fix.get('heading'),
+                'timestamp': timestamp
+            })
+            
+            rooms = await self.publish(user, {
+                'userId': user_id,
+                'lat': fix['lat'],
+                'lng': fix['lng'],
+                'accuracy': fix.get('accuracy'),
+                'timestamp': timestamp.isoformat()
+            })
+            hint = await self.send_hint(user.id, rooms, speed=fix.get('speed'))
+            return 201, {'message': 'Location updated successfully', 'rate_hint': hint}, {}
+        
+        except ValidationError as err:
+            return 400, {'message': 'Validation error', 'errors': err.messages}, {}
+        except ValueError:
+            return 400, {'message': 'Invalid JSON body'}, {}
+        except Exception as e:
+            return 500, {'message': 'Failed to update location', 'error': str(e)}, {}
+    
+    @staticmethod
+    async def _respond(send, status, payload, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        raw_headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            (b'access-control-allow-methods', b'POST, GET, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type, Authorization'),
+        ]
+        raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': body})
+    
+    # Sockets
+    
+    async def _socket_user(self, sid):
+        session = await self.sio.get_session(sid)
+        return session.get('user_id')
+    
+    async def _set_inactive_after_grace(self, user_id):
+        await asyncio.sleep(self.grace)
+        if self._connections.get(user_id):
+            return
+        user = await self.load_user(user_id)
+        if user:
+            await self.set_active(user, False)
+    
+    def _register_events(self):
+        sio = self.sio
+        
+        @sio.event
+        async def connect(sid, environ, auth=None):
+            token = (auth or {}).get('token') or parse_qs(environ.get('QUERY_STRING', '')).get('token', [None])[0]
+            if not token:
+                return False
+            try:
+                user_id = self.identity(token)
+            except InvalidTokenError:
+                return False
+            
+            user = await self.load_user(user_id)
+            if not user:
+                return False
+            if not user.is_active:
+                await self.set_active(user, True)
+            
+            await sio.save_session(sid, {'user_id': str(user_id)})
+            await sio.enter_room(sid, f'user_{user_id}')
+            rooms = broadcast_rooms(user)
+            for room in rooms:
+                await sio.enter_room(sid, room)
+            self._connections.setdefault(str(user_id), set()).add(sid)
+            
+            await self.refresh_hints(rate_hints.join(sid, user_id, rooms))
+            return True
+        
+        @sio.event
+        async def disconnect(sid, *args):
+            user_id = await self._socket_user(sid)
+            if user_id is None:
+                return
+            sids = self._connections.get(user_id, set())
+            sids.discard(sid)
+            if not sids:
+                self._connections.pop(user_id, None)
+                if self.grace > 0:
+                    asyncio.ensure_future(self._set_inactive_after_grace(user_id))
+                else:
+                    user = await self.load_user(user_id)
+                    if user:
+                        await self.set_active(user, False)
+            
+            user = await self.load_user(user_id)
+            if user:
+                for room in broadcast_rooms(user):
+                    await sio.leave_room(sid, room)
+            await self.refresh_hints(rate_hints.leave(sid))
+        
+        @sio.on('update_location')
+        async def update_location(sid, data):
+            with admission.track():
+                user_id = await self._socket_user(sid)
+                if user_id is None:
+                    return await sio.disconnect(sid)
+                
+                if admission.should_shed():
+                    return await sio.emit('throttled', {'reason': 'overloaded', 'retry_after': 1}, to=sid)
+                for scope, key in (('socket_connection', sid), ('socket_user', user_id)):
+                    allowed, retry_after = await self.rate_limit(scope, key)
+                    if not allowed:
+                        return await sio.emit('throttled', {'reason': 'rate_limited', 'retry_after': round(retry_after, 2)}, to=sid)
+                
+                user = await self.load_user(user_id)
+                if not user:
+                    return await sio.disconnect(sid)
+                data = data or {}
+                rooms = await self.publish(user, {
+                    'userId': user_id,
+                    'lat': data.get('lat'),
+                    'lng': data.get('lng'),
+                    'accuracy': data.get('accuracy'),
+                    'timestamp': data.get('timestamp')
+                }, skip_sid=sid)
+                await self.send_hint(user_id, rooms, speed=data.get('speed'))
+        
+        @sio.event
+        async def resume(sid, data):
+            data = data or {}
+            summary, missed = room_log.replay(sio.rooms(sid), data.get('epoch'), data.get('seqs') or {})
+            for event, message in missed:
+                await sio.emit(event, message, to=sid)
+            return summary
+
+
+def create_async_app(config_object=None):
+    """Build the ASGI ingest service around a regular Flask app"""
+    from app import create_app
+    return AsyncIngestService(create_app(config_object))
@@ -0,0 +1,52 @@
+from datetime import datetime
+from marshmallow import Schema, fields, validate
+from app import db
+
+class Group(db.Model):
+    """Group of users sharing locations with each other"""
+    __tablename__ = 'groups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    memberships = db.relationship('GroupMembership', backref='group', lazy=True,
+                                  cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<Group {self.name}>'
+
+
+class GroupMembership(db.Model):
+    """Membership of a user in a group"""
+    __tablename__ = 'group_memberships'
+    __table_args__ = (db.UniqueConstraint('group_id', 'user_id'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user = db.relationship('User', backref=db.backref('memberships', lazy=True,
+                                                      cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<GroupMembership group={self.group_id} user={self.user_id}>'
+    
+    @classmethod
+    def table_version(cls):
+        """Cheap (count, max id) summary that changes whenever memberships change"""
+        return db.session.query(db.func.count(cls.id), db.func.max(cls.id)).one()
+
+
+class GroupSchema(Schema):
+    """Schema for serializing/deserializing Group objects"""
+    id = fields.Int(dump_only=True)
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    description = fields.Str(allow_none=True, validate=validate.Length(max=255))
+    created_at = fields.DateTime(dump_only=True)
+    member_count = fields.Method('get_member_count', dump_only=True)
+    
+    def get_member_count(self, group):
+        return len(group.memberships)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 from app import db
 
 class Location(db.Model):
@@ -7,17 +7,25 @@ class Location(db.Model):
     __tablename__ = 'locations'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     altitude = db.Column(db.Float, nullable=True)
     accuracy = db.Column(db.Float, nullable=True)
     speed = db.Column(db.Float, nullable=True)
     heading = db.Column(db.Float, nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<Location {self.id}: ({self.latitude}, {self.longitude})>'
+    
+    @classmethod
+    def latest_version(cls, user_id):
+        """(id, timestamp) of the latest location of a user, or None"""
+        return db.session.query(cls.id, cls.timestamp)\
+            .filter_by(user_id=user_id)\
+            .order_by(cls.timestamp.desc())\
+            .first()
 
 
 class LocationSchema(Schema):
@@ -31,3 +39,14 @@ class LocationSchema(Schema):
     speed = fields.Float()
     heading = fields.Float()
     timestamp = fields.DateTime()
+
+
+class LocationFixSchema(Schema):
+    """Schema for validating a location fix reported by a client"""
+    lat = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    lng = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    accuracy = fields.Float(allow_none=True)
+    altitude = fields.Float(allow_none=True)
+    speed = fields.Float(allow_none=True)
+    heading = fields.Float(allow_none=True)
+    timestamp = fields.Raw(allow_none=True)  # client clock, not trusted for storage
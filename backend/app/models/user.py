@@ -24,6 +24,13 @@ class User(db.Model):
     
     def __repr__(self):
         return f'<User {self.email}>'
+    
+    @classmethod
+    def table_version(cls):
+        """Cheap (count, max id, last update) summary that changes on every user write"""
+        return db.session.query(
+            db.func.count(cls.id), db.func.max(cls.id), db.func.max(cls.updated_at)
+        ).one()
 
 
 class UserSchema(Schema):
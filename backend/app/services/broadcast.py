@@ -0,0 +1,132 @@
+# Sequence-numbered room broadcasts with a bounded replay buffer per room
+import secrets
+import threading
+from collections import deque
+
+from flask_socketio import rooms as joined_rooms
+
+# Rooms whose broadcasts are sequenced and can be replayed on resume
+BROADCAST_ROOM_PREFIXES = ('all_users', 'group_')
+
+def is_broadcast_room(room):
+    return room.startswith(BROADCAST_ROOM_PREFIXES)
+
+
+class RoomLog:
+    """Numbers every broadcast per room and keeps the latest ones for replay.
+    
+    Sequence numbers are only meaningful within one worker process; the
+    epoch changes on every start so clients can detect a restarted worker
+    (or a reconnect to a different one) and fall back to a full reload.
+    """
+    
+    def __init__(self, maxlen=256):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self.epoch = secrets.token_hex(8)
+        self._rooms = {}
+        self.published = 0
+        self.replayed = 0
+        self.resyncs = 0
+    
+    def init_app(self, app):
+        self.maxlen = int(app.config.get('BROADCAST_BUFFER_SIZE', 256))
+        with self._lock:
+            self._reset()
+    
+    def _room(self, room):
+        if room not in self._rooms:
+            self._rooms[room] = [0, deque(maxlen=self.maxlen)]
+        return self._rooms[room]
+    
+    def record(self, room, event, data):
+        """Assign the next sequence number in room and remember the message"""
+        with self._lock:
+            state = self._room(room)
+            state[0] += 1
+            message = dict(data, room=room, seq=state[0], epoch=self.epoch)
+            state[1].append((event, message))
+            self.published += 1
+        return message
+    
+    def publish(self, socketio, room, event, data, skip_sid=None):
+        """Record a message in room and emit it"""
+        message = self.record(room, event, data)
+        socketio.emit(event, message, to=room, skip_sid=skip_sid)
+        return message['seq']
+    
+    def cursor(self, room):
+        """Sequence number of the latest broadcast in room"""
+        with self._lock:
+            state = self._rooms.get(room)
+            return state[0] if state else 0
+    
+    def since(self, room, last_seq):
+        """Messages after last_seq as (messages, complete).
+        
+        complete is False when some of the missed messages have already
+        been dropped from the buffer and the client must reload instead.
+        """
+        with self._lock:
+            seq, buffer = self._rooms.get(room, (0, ()))
+            missed = [entry for entry in buffer if entry[1]['seq'] > last_seq]
+            oldest = buffer[0][1]['seq'] if buffer else seq + 1
+            complete = oldest - 1 <= last_seq <= seq
+        return missed, complete
+    
+    def resume(self, emit, sid, epoch, seqs, namespace='/'):
+        """Replay missed broadcasts to one socket; returns a per-room summary.
+        
+        Clients send this after every connect. A first connect (no epoch)
+        simply learns the current epoch and cursors from the summary.
+        """
+        summary, missed = self.replay(joined_rooms(sid, namespace), epoch, seqs)
+        for event, message in missed:
+            emit(event, message, to=sid)
+        return summary
+    
+    def replay(self, rooms, epoch, seqs):
+        """(summary, missed messages) for a socket in rooms resuming from seqs"""
+        rooms = [room for room in rooms if is_broadcast_room(room)]
+        replay = []
+        summary = {}
+        for room in rooms:
+            last_seq = seqs.get(room)
+            if epoch is None:
+                summary[room] = {'replayed': 0, 'resync': False, 'seq': self.cursor(room)}
+                continue
+            if epoch != self.epoch or not isinstance(last_seq, int):
+                missed, complete = [], False
+            else:
+                missed, complete = self.since(room, last_seq)
+            
+            if complete:
+                replay.extend(missed)
+            with self._lock:
+                if complete:
+                    self.replayed += len(missed)
+                else:
+                    self.resyncs += 1
+            summary[room] = {
+                'replayed': len(missed) if complete else 0,
+                'resync': not complete,
+                'seq': self.cursor(room),
+            }
+        return {'epoch': self.epoch, 'rooms': summary}, replay
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'rooms': len(self._rooms),
+                'buffer_size': self.maxlen,
+                'published': self.published,
+                'replayed': self.replayed,
+                'resyncs': self.resyncs,
+            }
+
+
+room_log = RoomLog()
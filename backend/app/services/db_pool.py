@@ -0,0 +1,105 @@
+# Database connection pool helpers: gevent cooperation and utilisation metrics
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+_stats = {
+    'checkouts': 0,
+    'checkins': 0,
+    'connects': 0,
+    'invalidations': 0,
+    'peak_checked_out': 0,
+    'max_checkout_seconds': 0.0,
+}
+_checked_out = 0
+_lock = threading.Lock()
+_listening = False
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback that yields to the gevent hub while waiting on the socket"""
+    from gevent.socket import wait_read, wait_write
+    import psycopg2
+    from psycopg2 import extensions
+    
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+def make_psycopg_green():
+    """Install the gevent wait callback so psycopg2 queries don't block the hub"""
+    try:
+        from psycopg2 import extensions
+        import gevent  # noqa: F401
+    except ImportError:
+        return False
+    
+    if not hasattr(extensions, 'set_wait_callback'):
+        return False
+    
+    extensions.set_wait_callback(gevent_wait_callback)
+    return True
+
+def _on_connect(dbapi_connection, connection_record):
+    with _lock:
+        _stats['connects'] += 1
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    global _checked_out
+    connection_record.info['checkout_time'] = time.monotonic()
+    with _lock:
+        _checked_out += 1
+        _stats['checkouts'] += 1
+        _stats['peak_checked_out'] = max(_stats['peak_checked_out'], _checked_out)
+
+def _on_checkin(dbapi_connection, connection_record):
+    global _checked_out
+    started = connection_record.info.pop('checkout_time', None)
+    with _lock:
+        if started is not None:
+            _checked_out -= 1
+            held = time.monotonic() - started
+            _stats['max_checkout_seconds'] = max(_stats['max_checkout_seconds'], held)
+        _stats['checkins'] += 1
+
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    with _lock:
+        _stats['invalidations'] += 1
+
+def install_pool_listeners():
+    """Track checkouts on every SQLAlchemy pool in this process"""
+    global _listening
+    if _listening:
+        return
+    event.listen(Pool, 'connect', _on_connect)
+    event.listen(Pool, 'checkout', _on_checkout)
+    event.listen(Pool, 'checkin', _on_checkin)
+    event.listen(Pool, 'invalidate', _on_invalidate)
+    _listening = True
+
+def pool_status(pool):
+    """Current utilisation of a single pool, where the pool type reports it"""
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+def pool_metrics(db):
+    """Metrics provider combining per-engine pool status and process counters"""
+    engines = {
+        bind_key or 'default': pool_status(engine.pool)
+        for bind_key, engine in db.engines.items()
+    }
+    with _lock:
+        counters = dict(_stats, checked_out=_checked_out)
+    return {'engines': engines, 'counters': counters}
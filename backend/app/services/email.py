@@ -1,25 +1,31 @@
 from flask import current_app, request
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 import logging
 import os
 
-# Set up email activity logger
 log_dir = os.path.join(os.path.dirname(__file__), '../../logs')
-os.makedirs(log_dir, exist_ok=True)
 email_log_path = os.path.join(log_dir, 'email_activity.log')
-email_logger = logging.getLogger('email_activity')
-if not email_logger.hasHandlers():
-    handler = logging.FileHandler(email_log_path)
-    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-    handler.setFormatter(formatter)
-    email_logger.addHandler(handler)
-    email_logger.setLevel(logging.INFO)
+
+def get_email_logger():
+    """Email activity logger, creating its log file on first use rather than at import"""
+    email_logger = logging.getLogger('email_activity')
+    if not email_logger.hasHandlers():
+        os.makedirs(log_dir, exist_ok=True)
+        handler = logging.FileHandler(email_log_path)
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+        handler.setFormatter(formatter)
+        email_logger.addHandler(handler)
+        email_logger.setLevel(logging.INFO)
+    return email_logger
 
 def send_email(to_email, subject, html_content):
     """Send an email with the configured mail server"""
+    # Only needed when a mail is actually sent, so kept out of worker startup
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    email_logger = get_email_logger()
     try:
         # Get mail configuration
         mail_server = current_app.config['MAIL_SERVER']
@@ -0,0 +1,53 @@
+# Group scoping of location visibility and broadcast fan-out
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+from app import db
+from app.models.group import GroupMembership
+from app.models.user import User
+from app.services.user_cache import user_cache
+
+# Users without any group share this legacy broadcast domain
+UNGROUPED_ROOM = 'all_users'
+
+def group_room(group_id):
+    return f'group_{group_id}'
+
+def broadcast_rooms(user):
+    """Rooms a user's location updates are fanned out to (and that they listen on)"""
+    if user.group_ids:
+        return [group_room(group_id) for group_id in user.group_ids]
+    return [UNGROUPED_ROOM]
+
+def can_view(viewer, target_id):
+    """Whether viewer may see the locations of the user with target_id"""
+    if viewer.role == 'admin' or viewer.id == int(target_id):
+        return True
+    target = user_cache.get(target_id)
+    if target is None:
+        return False
+    if not viewer.group_ids and not target.group_ids:
+        return True
+    return bool(set(viewer.group_ids) & set(target.group_ids))
+
+def visible_users_filter(viewer):
+    """SQL criterion restricting a User query to the users sharing a group with viewer"""
+    if viewer.group_ids:
+        members = db.select(GroupMembership.user_id)\
+            .where(GroupMembership.group_id.in_(viewer.group_ids))
+        return User.id.in_(members)
+    return User.id.not_in(db.select(GroupMembership.user_id))
+
+def require_visible_user(fn):
+    """Decorator rejecting access to a user_id outside the caller's groups"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        viewer = user_cache.get(get_jwt_identity())
+        if viewer is None:
+            return jsonify({'message': 'User not found'}), 404
+        if not can_view(viewer, kwargs['user_id']):
+            return jsonify({'message': 'Unauthorized access'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,206 @@
+# Density heatmap tiles (slippy map z/x/y PNGs) aggregated from location history
+import math
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798  # Web Mercator limit
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) in degrees of a slippy map tile"""
+    n = 2 ** z
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+def tile_of(lat, lng, z):
+    """(x, y) of the tile containing a point at zoom z"""
+    n = 2 ** z
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def bin_tile(lat, lng, z, x, y, bins):
+    """Counts of the points per cell of a bins x bins grid over tile z/x/y (row 0 is north)"""
+    n = 2 ** z
+    lat = np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)
+    # Position in tile units, the fraction being the offset inside the tile
+    tx = (lng + 180.0) / 360.0 * n - x
+    ty = (1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n - y
+    counts, _, _ = np.histogram2d(ty, tx, bins=bins, range=[[0, 1], [0, 1]])
+    return counts
+
+def cell_edges(z, x, y, bins):
+    """Inner cell boundaries of tile z/x/y: latitudes north to south, longitudes west to east"""
+    n = 2 ** z
+    fractions = np.arange(1, bins) / bins
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + fractions) / n))))
+    lngs = (x + fractions) / n * 360.0 - 180.0
+    return lats, lngs
+
+def _palette():
+    """256 RGBA colours from transparent through blue, green and yellow to red"""
+    stops = np.array([
+        [0.00, 0, 0, 255, 0],
+        [0.25, 0, 0, 255, 140],
+        [0.50, 0, 255, 0, 180],
+        [0.75, 255, 255, 0, 210],
+        [1.00, 255, 0, 0, 240],
+    ])
+    levels = np.linspace(0, 1, 256)
+    channels = [np.interp(levels, stops[:, 0], stops[:, i]) for i in range(1, 5)]
+    palette = np.stack(channels, axis=1).astype(np.uint8)
+    palette[0] = 0
+    return palette
+
+PALETTE = _palette()
+
+def render_png(counts, saturation):
+    """Colour a count grid on a log scale and encode it as a 256px RGBA PNG"""
+    level = np.log1p(counts) / math.log1p(max(saturation, 1))
+    index = np.clip(np.ceil(level * 255), 0, 255).astype(np.uint8)
+    scale = TILE_SIZE // counts.shape[0]
+    pixels = PALETTE[np.repeat(np.repeat(index, scale, axis=0), scale, axis=1)]
+    
+    # Every scanline starts with filter type 0 (none)
+    raw = np.zeros((TILE_SIZE, TILE_SIZE * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(TILE_SIZE, -1)
+    
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', TILE_SIZE, TILE_SIZE, 8, 6, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)),
+        chunk(b'IEND', b''),
+    ])
+
+
+class HeatmapTiles:
+    """Renders and caches density tiles of the location history.
+    
+    Each tile is a HEATMAP_BINS x HEATMAP_BINS histogram of the fixes inside
+    it, coloured on a log scale that saturates at HEATMAP_SATURATION fixes
+    per cell, so tiles line up across zoom levels. Rendered tiles are kept
+    in an LRU cache. New fixes evict the cached tiles containing them above
+    HEATMAP_COARSE_ZOOM; at and below it, where nearly every fix lands in
+    the same few tiles, they only mark them dirty and a dirty tile is
+    re-rendered at most every HEATMAP_REFRESH_INTERVAL seconds. Removals
+    clear the cache, and entries expire after HEATMAP_CACHE_TTL seconds to
+    pick up writes made by other processes.
+    """
+    
+    def __init__(self, bins=64, saturation=100, max_zoom=18, cache_size=2048, ttl=300.0,
+                 coarse_zoom=10, refresh_interval=60.0):
+        self.bins = bins
+        self.saturation = saturation
+        self.max_zoom = max_zoom
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.coarse_zoom = coarse_zoom
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._clear()
+    
+    def _clear(self):
+        self._tiles = OrderedDict()
+        self._by_tile = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.refreshes = 0
+    
+    def init_app(self, app):
+        from app.services.location_store import location_store
+        
+        self.bins = int(app.config.get('HEATMAP_BINS', 64))
+        if self.bins <= 0 or TILE_SIZE % self.bins:
+            raise ValueError(f"HEATMAP_BINS must divide {TILE_SIZE}")
+        self.saturation = float(app.config.get('HEATMAP_SATURATION', 100))
+        self.max_zoom = int(app.config.get('HEATMAP_MAX_ZOOM', 18))
+        self.cache_size = int(app.config.get('HEATMAP_CACHE_SIZE', 2048))
+        self.ttl = float(app.config.get('HEATMAP_CACHE_TTL', 300))
+        self.coarse_zoom = int(app.config.get('HEATMAP_COARSE_ZOOM', 10))
+        self.refresh_interval = float(app.config.get('HEATMAP_REFRESH_INTERVAL', 60))
+        with self._lock:
+            self._clear()
+        location_store.add_listener(self.on_write)
+    
+    def tile(self, z, x, y, user_ids=None, start=None, end=None, scope=None):
+        """PNG bytes of tile z/x/y for the fixes of user_ids (None: everyone).
+        
+        scope identifies the user selection (e.g. a group) in the cache key.
+        """
+        from app.services.location_store import location_store
+        
+        key = (z, x, y, scope, start, end)
+        now = time.monotonic()
+        with self._lock:
+            # Entries are [png, expires, rendered, dirty]
+            entry = self._tiles.get(key)
+            if entry is not None and entry[1] > now:
+                if not entry[3] or now - entry[2] < self.refresh_interval:
+                    self._tiles.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.refreshes += 1
+            self.misses += 1
+        
+        counts = location_store.density(z, x, y, self.bins, user_ids, start, end)
+        png = render_png(counts, self.saturation)
+        
+        if self.cache_size > 0:
+            with self._lock:
+                self._tiles[key] = [png, now + self.ttl, now, False]
+                self._tiles.move_to_end(key)
+                self._by_tile.setdefault((z, x, y), set()).add(key)
+                while len(self._tiles) > self.cache_size:
+                    self._forget(self._tiles.popitem(last=False)[0])
+        return png
+    
+    def _forget(self, key):
+        keys = self._by_tile.get(key[:3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_tile[key[:3]]
+    
+    def on_write(self, rows):
+        """Location store listener: evict or mark dirty the tiles the new fixes fall into"""
+        with self._lock:
+            if rows is None:
+                self._tiles.clear()
+                self._by_tile.clear()
+                self.invalidations += 1
+                return
+            if not self._tiles:
+                return
+            for row in rows:
+                for z in range(self.max_zoom + 1):
+                    x, y = tile_of(row['latitude'], row['longitude'], z)
+                    if z <= self.coarse_zoom:
+                        for key in self._by_tile.get((z, x, y), ()):
+                            self._tiles[key][3] = True
+                        continue
+                    for key in self._by_tile.pop((z, x, y), ()):
+                        self._tiles.pop(key, None)
+                        self.invalidations += 1
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'tiles': len(self._tiles),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'refreshes': self.refreshes,
+            }
+
+
+heatmap_tiles = HeatmapTiles()
@@ -0,0 +1,102 @@
+# Conditional GET (ETag / Last-Modified) and response compression helpers
+import gzip
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+
+def make_etag(*parts):
+    """Stable entity tag from the parts of a validator"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+def conditional(validator):
+    """Decorator answering conditional GETs from a cheap validator.
+    
+    The validator receives the view arguments and returns a tuple of
+    (parts, last_modified) describing the current version of the resource,
+    or None when no version can be determined. Matching requests get a
+    304 without running the view.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            version = validator(*args, **kwargs)
+            if version is None:
+                return fn(*args, **kwargs)
+            
+            parts, last_modified = version
+            etag = make_etag(request.path, *parts)
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Authenticated data: clients may store it but must revalidate
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response, min_size=1024, level=6):
+    """Compress a large textual response body with brotli or gzip"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    
+    encoding = _choose_encoding()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=min(level, 11))
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=level)
+    else:
+        return response
+    
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_app(app):
+    """Register response compression for the application"""
+    if not app.config.get('COMPRESS_RESPONSES', True):
+        return
+    min_size = int(app.config.get('COMPRESS_MIN_SIZE', 1024))
+    level = int(app.config.get('COMPRESS_LEVEL', 6))
+    
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size=min_size, level=level)
@@ -0,0 +1,193 @@
+# Durable local queue decoupling location ingest from database latency
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueue:
+    """Append-only queue of location fixes in a SQLite WAL file.
+    
+    Web workers put() fixes; the ingest process reads batches in order and
+    ack()s them once they are committed to the main database. Delivery is
+    at-least-once: a crash between commit and ack replays that batch.
+    """
+    
+    def __init__(self, path=None, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # One connection per process: threading.local would be greenlet-local
+        # under gevent and open a connection per request
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    def init_app(self, app):
+        self.close()
+        self.path = app.config.get('INGEST_QUEUE_PATH') or os.path.join(app.instance_path, 'ingest-queue.db')
+        self.busy_timeout = float(app.config.get('INGEST_QUEUE_BUSY_TIMEOUT', 5))
+    
+    def _execute(self, sql, parameters=()):
+        """Run one statement on the shared connection; returns the fetched rows"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._open()
+            return self._conn.execute(sql, parameters).fetchall()
+    
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS fixes ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'payload TEXT NOT NULL, '
+            'enqueued_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letters ('
+            'id INTEGER PRIMARY KEY, '
+            'payload TEXT NOT NULL, '
+            'error TEXT NOT NULL, '
+            'failed_at REAL NOT NULL)'
+        )
+        return conn
+    
+    def put(self, fix):
+        """Durably append one fix (a JSON-serialisable dict)"""
+        self._execute(
+            'INSERT INTO fixes (payload, enqueued_at) VALUES (?, ?)',
+            (json.dumps(fix), time.time())
+        )
+    
+    def get_batch(self, limit=500):
+        """Oldest pending fixes as a list of (queue id, fix) without removing them"""
+        rows = self._execute('SELECT id, payload FROM fixes ORDER BY id LIMIT ?', (limit,))
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+    
+    def ack(self, last_id):
+        """Remove every fix up to and including last_id"""
+        self._execute('DELETE FROM fixes WHERE id <= ?', (last_id,))
+    
+    def dead_letter(self, row_id, fix, error):
+        """Park a fix the database keeps rejecting so it no longer blocks the queue"""
+        self._execute(
+            'INSERT OR REPLACE INTO dead_letters (id, payload, error, failed_at) VALUES (?, ?, ?, ?)',
+            (row_id, json.dumps(fix), str(error), time.time())
+        )
+    
+    def dead_letters(self, limit=100):
+        """Oldest parked fixes as a list of (queue id, fix, error)"""
+        rows = self._execute('SELECT id, payload, error FROM dead_letters ORDER BY id LIMIT ?', (limit,))
+        return [(row_id, json.loads(payload), error) for row_id, payload, error in rows]
+    
+    def depth(self):
+        return self._execute('SELECT COUNT(*) FROM fixes')[0][0]
+    
+    def metrics(self):
+        return {
+            'path': self.path,
+            'depth': self.depth(),
+            'dead_letters': self._execute('SELECT COUNT(*) FROM dead_letters')[0][0],
+        }
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+ingest_queue = IngestQueue()
+
+def drain_once(queue, batch_size=500):
+    """Move one batch from the queue into the database; returns the number of fixes stored.
+    
+    A batch the database rejects (e.g. a fix of a user deleted meanwhile) is
+    retried fix by fix and the offending fixes are moved to the queue's dead
+    letters. Other errors propagate so the worker backs off and retries.
+    """
+    batch = queue.get_batch(batch_size)
+    if not batch:
+        return 0
+    
+    entries = []
+    for row_id, fix in batch:
+        try:
+            row = dict(fix)
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Dead-lettering malformed queued fix {row_id}: {str(e)}")
+            queue.dead_letter(row_id, fix, e)
+            continue
+        entries.append((row_id, fix, row))
+    
+    try:
+        _store([row for _, _, row in entries])
+        stored = len(entries)
+    except (IntegrityError, DataError):
+        stored = 0
+        for index, (row_id, fix, row) in enumerate(entries):
+            try:
+                _store([row])
+                stored += 1
+            except (IntegrityError, DataError) as e:
+                logger.error(f"Dead-lettering queued fix {row_id}: {str(e.orig)}")
+                queue.dead_letter(row_id, fix, e.orig)
+            except Exception:
+                # Keep what was committed so far from being replayed
+                if index:
+                    queue.ack(entries[index - 1][0])
+                raise
+    
+    queue.ack(batch[-1][0])
+    return stored
+
+def _store(rows):
+    """Insert fixes and mark their users active in one transaction"""
+    from app import db
+    from app.models.user import User
+    from app.services.location_store import location_store
+    
+    if not rows:
+        return
+    try:
+        location_store.add_many(rows)
+        User.query.filter(User.id.in_({row['user_id'] for row in rows}), User.is_active == False)\
+            .update({'is_active': True}, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def run_ingest_worker(app, queue=None):
+    """Drain the ingest queue forever, backing off while the database is unavailable"""
+    queue = queue or ingest_queue
+    batch_size = int(app.config.get('INGEST_BATCH_SIZE', 500))
+    idle_sleep = float(app.config.get('INGEST_POLL_INTERVAL', 0.5))
+    max_backoff = float(app.config.get('INGEST_MAX_BACKOFF', 30))
+    backoff = idle_sleep
+    
+    print(f"Ingest worker draining {queue.path}")
+    with app.app_context():
+        while True:
+            try:
+                stored = drain_once(queue, batch_size)
+                backoff = idle_sleep
+            except Exception as e:
+                logger.error(f"Ingest batch failed, retrying in {backoff:.1f}s: {str(e)}")
+                time.sleep(backoff)
+                backoff = min(max_backoff, backoff * 2)
+                continue
+            
+            # Keep draining while there is a backlog, otherwise poll
+            if stored < batch_size:
+                time.sleep(idle_sleep)
@@ -0,0 +1,401 @@
+# Repository interface over the storage backends for location history
+import logging
+import math
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width record layout shared by the track log files and array reads
+TRACK_DTYPE = np.dtype([
+    ('timestamp', '<f8'),  # seconds since the epoch, UTC
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('altitude', '<f4'),
+    ('accuracy', '<f4'),
+    ('speed', '<f4'),
+    ('heading', '<f4'),
+])
+
+TrackPoint = namedtuple('TrackPoint', [
+    'id', 'user_id', 'latitude', 'longitude', 'altitude', 'accuracy', 'speed', 'heading', 'timestamp'
+])
+
+OPTIONAL_FIELDS = ('altitude', 'accuracy', 'speed', 'heading')
+
+def to_epoch(value):
+    """Naive UTC datetime to epoch seconds"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def from_epoch(seconds):
+    """Epoch seconds to a naive UTC datetime, like the SQL timestamps"""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+def track_stats(points):
+    """Summary statistics of a TRACK_DTYPE array ordered by time"""
+    if len(points) == 0:
+        return {'count': 0}
+    
+    lat = np.radians(points['latitude'])
+    lng = np.radians(points['longitude'])
+    # Haversine distance between consecutive fixes
+    dlat = np.diff(lat)
+    dlng = np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    distance_km = float(np.sum(2 * 6371.0088 * np.arcsin(np.sqrt(a))))
+    
+    speed = points['speed']
+    max_speed = float(np.nanmax(speed)) if np.any(~np.isnan(speed)) else None
+    return {
+        'count': int(len(points)),
+        'first': from_epoch(float(points['timestamp'][0])).isoformat(),
+        'last': from_epoch(float(points['timestamp'][-1])).isoformat(),
+        'duration_seconds': float(points['timestamp'][-1] - points['timestamp'][0]),
+        'distance_km': round(distance_km, 3),
+        'max_speed': max_speed,
+        'bbox': {
+            'min_lat': float(points['latitude'].min()),
+            'min_lng': float(points['longitude'].min()),
+            'max_lat': float(points['latitude'].max()),
+            'max_lng': float(points['longitude'].max()),
+        },
+    }
+
+
+class LocationRepository:
+    """Storage-agnostic access to location fixes.
+    
+    Rows passed to add()/add_many() are dicts with the Location column
+    names (user_id, latitude, longitude, altitude, accuracy, speed,
+    heading, timestamp). Writes join the caller's database transaction
+    where the backend has one; callers still commit the session.
+    """
+    
+    # Whether writes only become visible when the caller's session commits
+    transactional = False
+    
+    def add(self, row):
+        self.add_many([row])
+    
+    def add_many(self, rows):
+        raise NotImplementedError
+    
+    def latest(self, user_id):
+        """Most recent fix of a user, or None"""
+        raise NotImplementedError
+    
+    def latest_version(self, user_id):
+        """(version parts, timestamp) identifying the latest fix, or None"""
+        raise NotImplementedError
+    
+    def history(self, user_id, page, per_page):
+        """One page of fixes, newest first, as (items, total)"""
+        raise NotImplementedError
+    
+    def iter_range(self, user_id, start=None, end=None):
+        """Fixes between two naive UTC datetimes, oldest first"""
+        raise NotImplementedError
+    
+    def arrays(self, user_id, start=None, end=None):
+        """Fixes between two naive UTC datetimes as a TRACK_DTYPE array"""
+        raise NotImplementedError
+    
+    def stats(self, user_id, start=None, end=None):
+        return track_stats(self.arrays(user_id, start, end))
+    
+    def user_ids(self):
+        """Ids of the users with stored fixes"""
+        raise NotImplementedError
+    
+    def coordinates(self, user_ids=None, start=None, end=None, bounds=None):
+        """(latitudes, longitudes) arrays of the fixes of several users (None: everyone),
+        optionally limited to a time window and (south, west, north, east) bounds"""
+        lats, lngs = [], []
+        for user_id in (self.user_ids() if user_ids is None else user_ids):
+            points = self.arrays(user_id, start, end)
+            lats.append(points['latitude'])
+            lngs.append(points['longitude'])
+        lat = np.concatenate(lats) if lats else np.empty(0)
+        lng = np.concatenate(lngs) if lngs else np.empty(0)
+        if bounds is not None:
+            south, west, north, east = bounds
+            inside = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+            lat, lng = lat[inside], lng[inside]
+        return lat, lng
+    
+    def density(self, z, x, y, bins, user_ids=None, start=None, end=None):
+        """bins x bins counts of the fixes inside slippy map tile z/x/y (row 0 is north)"""
+        from app.services.heatmap import bin_tile, tile_bounds
+        
+        lat, lng = self.coordinates(user_ids, start, end, bounds=tile_bounds(z, x, y))
+        return bin_tile(lat, lng, z, x, y, bins)
+    
+    def delete_user(self, user_id):
+        """Remove every fix of a user"""
+        raise NotImplementedError
+    
+    def delete_users(self, user_ids):
+        """Remove every fix of several users"""
+        for user_id in user_ids:
+            self.delete_user(user_id)
+    
+    def prune(self, before, chunk_size=5000):
+        """Remove fixes older than a naive UTC datetime; returns how many were removed"""
+        raise NotImplementedError
+
+
+class SqlLocationRepository(LocationRepository):
+    """Locations stored as rows of the locations table"""
+    
+    transactional = True
+    
+    def _query(self, user_id, start=None, end=None):
+        from app.models.location import Location
+        
+        query = Location.query.filter_by(user_id=user_id)
+        if start is not None:
+            query = query.filter(Location.timestamp >= start)
+        if end is not None:
+            query = query.filter(Location.timestamp <= end)
+        return query
+    
+    def add_many(self, rows):
+        from app import db
+        from app.models.location import Location
+        
+        db.session.execute(db.insert(Location), rows)
+    
+    def latest(self, user_id):
+        from app.models.location import Location
+        
+        return self._query(user_id).order_by(Location.timestamp.desc()).first()
+    
+    def latest_version(self, user_id):
+        from app.models.location import Location
+        
+        latest = Location.latest_version(user_id)
+        if latest is None:
+            return None
+        location_id, timestamp = latest
+        return (location_id, str(timestamp)), timestamp
+    
+    def history(self, user_id, page, per_page):
+        from app.models.location import Location
+        
+        locations = self._query(user_id)\
+            .order_by(Location.timestamp.desc())\
+            .paginate(page=page, per_page=per_page, error_out=False)
+        return locations.items, locations.total
+    
+    def iter_range(self, user_id, start=None, end=None):
+        from app.models.location import Location
+        
+        return self._query(user_id, start, end).order_by(Location.timestamp).yield_per(1000)
+    
+    def arrays(self, user_id, start=None, end=None):
+        from app import db
+        from app.models.location import Location
+        
+        query = self._query(user_id, start, end)\
+            .with_entities(Location.timestamp, Location.latitude, Location.longitude,
+                           Location.altitude, Location.accuracy, Location.speed, Location.heading)\
+            .order_by(Location.timestamp)
+        rows = [
+            (to_epoch(timestamp), lat, lng, *(math.nan if v is None else v for v in rest))
+            for timestamp, lat, lng, *rest in db.session.execute(query.statement)
+        ]
+        return np.array(rows, dtype=TRACK_DTYPE)
+    
+    def user_ids(self):
+        from app import db
+        from app.models.location import Location
+        
+        return [user_id for (user_id,) in db.session.query(Location.user_id).distinct()]
+    
+    @staticmethod
+    def _filter(query, user_ids, start, end, bounds):
+        from app.models.location import Location
+        
+        if user_ids is not None:
+            query = query.where(Location.user_id.in_(user_ids))
+        if start is not None:
+            query = query.where(Location.timestamp >= start)
+        if end is not None:
+            query = query.where(Location.timestamp <= end)
+        if bounds is not None:
+            south, west, north, east = bounds
+            query = query.where(Location.latitude.between(south, north), Location.longitude.between(west, east))
+        return query
+    
+    def coordinates(self, user_ids=None, start=None, end=None, bounds=None):
+        """One query over all the users, filtered in SQL, fetching only two columns"""
+        from app import db
+        from app.models.location import Location
+        
+        query = self._filter(db.select(Location.latitude, Location.longitude), user_ids, start, end, bounds)
+        rows = np.array(db.session.execute(query).all(), dtype=float).reshape(-1, 2)
+        return rows[:, 0], rows[:, 1]
+    
+    def density(self, z, x, y, bins, user_ids=None, start=None, end=None):
+        """Binned in SQL: one row per non-empty cell instead of one per fix.
+        
+        The cell boundaries are precomputed so the Mercator projection stays
+        out of the query; the CASE chains work on every dialect.
+        """
+        from app import db
+        from app.models.location import Location
+        from app.services.heatmap import cell_edges, tile_bounds
+        
+        lat_edges, lng_edges = cell_edges(z, x, y, bins)
+        row = db.case(*[(Location.latitude >= float(edge), i) for i, edge in enumerate(lat_edges)],
+                      else_=bins - 1) if bins > 1 else db.literal(0)
+        col = db.case(*[(Location.longitude < float(edge), i) for i, edge in enumerate(lng_edges)],
+                      else_=bins - 1) if bins > 1 else db.literal(0)
+        row, col = row.label('cell_row'), col.label('cell_col')
+        query = self._filter(db.select(row, col, db.func.count()), user_ids, start, end, tile_bounds(z, x, y))
+        
+        counts = np.zeros((bins, bins))
+        cells = np.array(db.session.execute(query.group_by(row, col)).all(), dtype=np.int64).reshape(-1, 3)
+        counts[cells[:, 0], cells[:, 1]] = cells[:, 2]
+        return counts
+    
+    def delete_user(self, user_id):
+        from app.models.location import Location
+        
+        # One set-based DELETE instead of loading the rows into the session
+        Location.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    
+    def delete_users(self, user_ids):
+        from app.models.location import Location
+        
+        Location.query.filter(Location.user_id.in_(user_ids)).delete(synchronize_session=False)
+    
+    def prune(self, before, chunk_size=5000):
+        """Delete in chunks of ids, committing each, so locks and undo stay bounded"""
+        from app import db
+        from app.models.location import Location
+        
+        removed = 0
+        while True:
+            ids = [row[0] for row in db.session.query(Location.id)
+                   .filter(Location.timestamp < before)
+                   .order_by(Location.id)
+                   .limit(chunk_size)]
+            if not ids:
+                return removed
+            Location.query.filter(Location.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += len(ids)
+
+
+_AFTER_COMMIT = 'location_store_after_commit'
+_hooks_installed = False
+
+def _run_after_commit(session):
+    for fn in session.info.pop(_AFTER_COMMIT, ()):
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Location store after-commit action failed: {str(e)}")
+
+def _drop_after_commit(session):
+    session.info.pop(_AFTER_COMMIT, None)
+
+def after_commit(fn):
+    """Run fn once the current session commits; a rollback discards it"""
+    from app import db
+    
+    db.session.info.setdefault(_AFTER_COMMIT, []).append(fn)
+
+def install_commit_hooks():
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from app import db
+    
+    event.listen(db.session, 'after_commit', _run_after_commit)
+    event.listen(db.session, 'after_rollback', _drop_after_commit)
+    _hooks_installed = True
+
+
+class LocationStore:
+    """Extension-style holder for the configured location repository.
+    
+    Writes go through the store so listeners (derived caches) learn about
+    them: they are called with the new rows, or with None when fixes were
+    removed. With a transactional repository they are called once the
+    caller's session commits, so a cache filled in between never misses
+    the write.
+    """
+    
+    def __init__(self):
+        self.repository = SqlLocationRepository()
+        self._listeners = []
+    
+    def add_listener(self, fn):
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+    
+    def _notify(self, rows):
+        for fn in self._listeners:
+            fn(rows)
+    
+    def _changed(self, rows):
+        if self.repository.transactional:
+            after_commit(lambda: self._notify(rows))
+        else:
+            self._notify(rows)
+    
+    def add(self, row):
+        self.add_many([row])
+    
+    def add_many(self, rows):
+        self.repository.add_many(rows)
+        self._changed(rows)
+    
+    def delete_user(self, user_id):
+        self.delete_users([user_id])
+    
+    def delete_users(self, user_ids):
+        if self.repository.transactional:
+            self.repository.delete_users(user_ids)
+            self._changed(None)
+            return
+        # Removed files cannot be rolled back: wait until the caller's
+        # deletion of the users (or whatever else it deletes) commits
+        repository = self.repository
+        def delete():
+            repository.delete_users(user_ids)
+            self._notify(None)
+        after_commit(delete)
+    
+    def prune(self, before, chunk_size=5000):
+        # Repositories commit each pruned chunk themselves
+        removed = self.repository.prune(before, chunk_size=chunk_size)
+        if removed:
+            self._notify(None)
+        return removed
+    
+    def init_app(self, app):
+        install_commit_hooks()
+        backend = app.config.get('LOCATION_BACKEND', 'sql')
+        if backend == 'tracklog':
+            from app.services.track_log import TrackLogRepository
+            directory = app.config.get('TRACKLOG_DIR') or os.path.join(app.instance_path, 'tracklog')
+            self.repository = TrackLogRepository(
+                directory, segment_records=int(app.config.get('TRACKLOG_SEGMENT_RECORDS', 65536))
+            )
+        elif backend == 'sql':
+            self.repository = SqlLocationRepository()
+        else:
+            raise ValueError(f"Unknown LOCATION_BACKEND: {backend}")
+    
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+
+location_store = LocationStore()
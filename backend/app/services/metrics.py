@@ -0,0 +1,23 @@
+# Registry of runtime metrics exposed through the admin API
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+def register_provider(name, provider):
+    """Register a callable returning a dict of metrics under the given name"""
+    with _lock:
+        _providers[name] = provider
+
+def collect():
+    """Collect a snapshot from every registered metrics provider"""
+    with _lock:
+        providers = dict(_providers)
+    
+    snapshot = {}
+    for name, provider in providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            snapshot[name] = {'error': str(e)}
+    return snapshot
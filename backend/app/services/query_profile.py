@@ -0,0 +1,131 @@
+# Development query profiling: per-request statement counts, timings and N+1 detection
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_listening = False
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and g.get('query_profile') is not None:
+        context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None or not has_request_context():
+        return
+    profile = g.get('query_profile')
+    if profile is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+def install_query_listeners():
+    """Time every statement executed by any engine in this process"""
+    global _listening
+    if _listening:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _listening = True
+
+
+class RequestProfile:
+    """Statements executed while handling one request"""
+    
+    def __init__(self, slow_seconds):
+        self.slow_seconds = slow_seconds
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.slow = []
+    
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        # Bound parameters are placeholders, so per-row lookups share one text
+        self.statements[statement] += 1
+        if seconds >= self.slow_seconds:
+            self.slow.append((statement, seconds))
+    
+    def repeated(self, threshold):
+        """(statement, executions) of statements run at least threshold times"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+class QueryProfiler:
+    """Counts queries and database time per request and flags likely N+1 patterns.
+    
+    A statement executed QUERY_PROFILE_REPEAT_THRESHOLD or more times in one
+    request is reported as a probable N+1 (typically a lazy relationship
+    loaded per row during serialization), statements slower than
+    QUERY_PROFILE_SLOW_MS are reported as slow. Findings are logged with the
+    route that caused them, summarised in an X-Query-Profile and a
+    Server-Timing response header, and aggregated per endpoint in metrics.
+    Meant for development and profiling runs, not production.
+    """
+    
+    def __init__(self):
+        self.slow_seconds = 0.1
+        self.repeat_threshold = 5
+        self.header = True
+        self._lock = threading.Lock()
+        self._endpoints = {}
+    
+    def init_app(self, app):
+        self.slow_seconds = float(app.config.get('QUERY_PROFILE_SLOW_MS', 100)) / 1000
+        self.repeat_threshold = int(app.config.get('QUERY_PROFILE_REPEAT_THRESHOLD', 5))
+        self.header = app.config.get('QUERY_PROFILE_HEADER', True)
+        with self._lock:
+            self._endpoints = {}
+        install_query_listeners()
+        app.before_request(self._start)
+        app.after_request(self._finish)
+    
+    def _start(self):
+        g.query_profile = RequestProfile(self.slow_seconds)
+    
+    def _finish(self, response):
+        profile = g.pop('query_profile', None)
+        if profile is None:
+            return response
+        
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        repeated = profile.repeated(self.repeat_threshold)
+        for statement, count in repeated:
+            logger.warning(f"Possible N+1 in {route}: {count} executions of {statement[:200]}")
+        for statement, seconds in profile.slow:
+            logger.warning(f"Slow query in {route} ({seconds * 1000:.1f} ms): {statement[:200]}")
+        
+        with self._lock:
+            stats = self._endpoints.setdefault(route, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'n_plus_one': 0, 'slow': 0
+            })
+            stats['requests'] += 1
+            stats['queries'] += profile.count
+            stats['max_queries'] = max(stats['max_queries'], profile.count)
+            stats['db_ms'] += profile.seconds * 1000
+            stats['n_plus_one'] += len(repeated)
+            stats['slow'] += len(profile.slow)
+        
+        if self.header:
+            db_ms = profile.seconds * 1000
+            response.headers['X-Query-Profile'] = (
+                f"queries={profile.count}; db_ms={db_ms:.1f}; n_plus_one={len(repeated)}; slow={len(profile.slow)}"
+            )
+            response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{profile.count} queries"')
+        return response
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                route: dict(stats, db_ms=round(stats['db_ms'], 1))
+                for route, stats in sorted(self._endpoints.items(), key=lambda item: -item[1]['queries'])
+            }
+
+
+query_profiler = QueryProfiler()
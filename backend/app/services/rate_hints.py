@@ -0,0 +1,146 @@
+# Server-computed reporting intervals pushed to clients as 'rate_hint' events
+import threading
+
+from app.services.rate_limit import admission
+
+
+class RateHints:
+    """Recommends how often each user should report their position.
+    
+    Users nobody is watching report at the maximum interval; watched users
+    report quickly while moving and slower while stationary. Every
+    recommendation is stretched by the current worker load. Viewers are
+    the sockets of other users in the user's broadcast rooms in this worker
+    process, kept as per-room counts adjusted as sockets join and leave, so
+    a hint costs one lookup per room (a socket sharing several rooms with
+    the user counts once per room).
+    """
+    
+    def __init__(self):
+        self.min_interval = 5.0
+        self.stationary_interval = 30.0
+        self.max_interval = 120.0
+        self.moving_speed = 1.0
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self._sockets = {}  # sid -> (user id, broadcast rooms)
+        self._user_sockets = {}
+        self._room_users = {}  # room -> {user id: sockets in the room}
+        self._room_sockets = {}
+        self._speeds = {}
+        self._hints = {}
+        self.sent = 0
+    
+    def init_app(self, app):
+        self.min_interval = float(app.config.get('RATE_HINT_MIN_INTERVAL', 5))
+        self.stationary_interval = float(app.config.get('RATE_HINT_STATIONARY_INTERVAL', 30))
+        self.max_interval = float(app.config.get('RATE_HINT_MAX_INTERVAL', 120))
+        self.moving_speed = float(app.config.get('RATE_HINT_MOVING_SPEED', 1.0))
+        with self._lock:
+            self._reset()
+    
+    def join(self, sid, user_id, rooms):
+        """Count a socket as a viewer of its broadcast rooms, replacing the rooms it
+        had; returns the ids of the users whose viewer counts changed"""
+        user_id = str(user_id)
+        rooms = tuple(rooms)
+        with self._lock:
+            affected = self._leave(sid)
+            self._sockets[sid] = (user_id, rooms)
+            self._user_sockets[user_id] = self._user_sockets.get(user_id, 0) + 1
+            for room in rooms:
+                users = self._room_users.setdefault(room, {})
+                users[user_id] = users.get(user_id, 0) + 1
+                self._room_sockets[room] = self._room_sockets.get(room, 0) + 1
+            return affected | self._users_in(rooms)
+    
+    def leave(self, sid):
+        """Stop counting a socket; returns the ids of the users whose viewer counts changed"""
+        with self._lock:
+            return self._leave(sid)
+    
+    def _leave(self, sid):
+        entry = self._sockets.pop(sid, None)
+        if entry is None:
+            return set()
+        user_id, rooms = entry
+        for room in rooms:
+            users = self._room_users[room]
+            users[user_id] -= 1
+            if not users[user_id]:
+                del users[user_id]
+            self._room_sockets[room] -= 1
+            if not self._room_sockets[room]:
+                del self._room_sockets[room], self._room_users[room]
+        self._user_sockets[user_id] -= 1
+        if not self._user_sockets[user_id]:
+            del self._user_sockets[user_id]
+            self._speeds.pop(user_id, None)
+            self._hints.pop(user_id, None)
+        return self._users_in(rooms)
+    
+    def _users_in(self, rooms):
+        return {user_id for room in rooms for user_id in self._room_users.get(room, ())}
+    
+    def viewers(self, user_id, rooms):
+        """Number of other users' sockets subscribed to the rooms, summed per room"""
+        user_id = str(user_id)
+        with self._lock:
+            return sum(
+                self._room_sockets.get(room, 0) - self._room_users.get(room, {}).get(user_id, 0)
+                for room in rooms
+            )
+    
+    def interval(self, viewers, speed=None, load=0.0):
+        """Recommended seconds between position reports"""
+        if viewers == 0:
+            interval = self.max_interval
+        elif speed is not None and speed >= self.moving_speed:
+            interval = self.min_interval
+        else:
+            interval = self.stationary_interval
+        interval *= 1 + max(0.0, load)
+        return round(min(self.max_interval, max(self.min_interval, interval)), 1)
+    
+    def hint(self, socketio, user_id, rooms, speed=None):
+        """Compute the hint for a user and push it to their sockets if it changed"""
+        hint, changed = self.update(user_id, rooms, speed)
+        if changed:
+            socketio.emit('rate_hint', hint, to=f'user_{user_id}')
+        return hint
+    
+    def update(self, user_id, rooms, speed=None):
+        """Compute the hint for a user; returns (hint, changed)"""
+        user_id = str(user_id)
+        viewers = self.viewers(user_id, rooms)
+        with self._lock:
+            if speed is not None:
+                self._speeds[user_id] = speed
+            hint = {'interval': self.interval(viewers, self._speeds.get(user_id), admission.load), 'viewers': viewers}
+            changed = self._hints.get(user_id) != hint
+            self._hints[user_id] = hint
+            if changed:
+                self.sent += 1
+        return hint, changed
+    
+    def refresh(self, socketio, user_ids, rooms_for_user):
+        """Push new hints to users whose viewers joined or left"""
+        for user_id in user_ids:
+            user_rooms = rooms_for_user(user_id)
+            if user_rooms:
+                self.hint(socketio, user_id, user_rooms)
+    
+    def metrics(self):
+        with self._lock:
+            intervals = [hint['interval'] for hint in self._hints.values()]
+            return {
+                'users': len(self._hints),
+                'hints_sent': self.sent,
+                'idle_users': sum(1 for hint in self._hints.values() if hint['viewers'] == 0),
+                'mean_interval': round(sum(intervals) / len(intervals), 1) if intervals else None,
+            }
+
+
+rate_hints = RateHints()
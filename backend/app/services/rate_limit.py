@@ -0,0 +1,244 @@
+# Token-bucket rate limiting and load shedding for location ingest
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+try:
+    import redis
+except ImportError:  # shared limits are optional, in-memory buckets are the default
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Shared storage failures the limiter survives by falling back to local buckets
+STORAGE_ERRORS = (redis.RedisError,) if redis is not None else ()
+
+# Scopes and the config keys holding their (rate per second, burst) limits
+LIMIT_SCOPES = {
+    'rest_user': ('RATELIMIT_REST_RATE', 'RATELIMIT_REST_BURST'),
+    'socket_user': ('RATELIMIT_SOCKET_USER_RATE', 'RATELIMIT_SOCKET_USER_BURST'),
+    'socket_connection': ('RATELIMIT_SOCKET_CONNECTION_RATE', 'RATELIMIT_SOCKET_CONNECTION_BURST'),
+}
+
+
+class MemoryStorage:
+    """Token buckets held in this worker process, bounded to max_keys entries"""
+    
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+
+class RedisStorage:
+    """Token buckets shared between workers through Redis"""
+    
+    SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or ARGV[3])
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+    
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("RATELIMIT_STORAGE_URL requires the 'redis' package")
+        # Short timeouts: a slow Redis must not hold up ingest
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._take = self._client.register_script(self.SCRIPT)
+    
+    def take(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._take(keys=[f'ratelimit:{key}'], args=[rate, burst, now])
+        tokens = float(tokens)
+        return bool(allowed), 0.0 if allowed else (1 - tokens) / rate
+
+
+class RateLimiter:
+    """Applies the configured per-scope limits and counts throttled events.
+    
+    While the shared storage is unreachable, limits are enforced per process
+    with in-memory buckets instead of failing the request.
+    """
+    
+    def __init__(self):
+        self.enabled = True
+        self.limits = {}
+        self.storage = MemoryStorage()
+        self._fallback = MemoryStorage()
+        self._lock = threading.Lock()
+        self._reset_stats()
+    
+    def _reset_stats(self):
+        self.allowed = {scope: 0 for scope in LIMIT_SCOPES}
+        self.throttled = {scope: 0 for scope in LIMIT_SCOPES}
+        self.storage_errors = 0
+        self._storage_down = False
+    
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.limits = {
+            scope: (float(app.config.get(rate_key, 1)), float(app.config.get(burst_key, 5)))
+            for scope, (rate_key, burst_key) in LIMIT_SCOPES.items()
+        }
+        storage_url = app.config.get('RATELIMIT_STORAGE_URL')
+        self.storage = RedisStorage(storage_url) if storage_url else MemoryStorage()
+        self._fallback = MemoryStorage()
+        self._reset_stats()
+    
+    def hit(self, scope, key):
+        """Consume one token for key in scope; returns (allowed, retry_after)"""
+        if not self.enabled:
+            return True, 0.0
+        rate, burst = self.limits[scope]
+        if rate <= 0:
+            return True, 0.0
+        error = None
+        try:
+            allowed, retry_after = self.storage.take(f'{scope}:{key}', rate, burst)
+        except STORAGE_ERRORS as e:
+            error = e
+            allowed, retry_after = self._fallback.take(f'{scope}:{key}', rate, burst)
+        with self._lock:
+            if error is not None:
+                self.storage_errors += 1
+                if not self._storage_down:
+                    logger.warning(f"Rate limit storage failed, using per-process limits: {str(error)}")
+            elif self._storage_down:
+                logger.info("Rate limit storage is reachable again")
+            self._storage_down = error is not None
+            if allowed:
+                self.allowed[scope] += 1
+            else:
+                self.throttled[scope] += 1
+        return allowed, retry_after
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'storage': type(self.storage).__name__,
+                'storage_errors': self.storage_errors,
+                'allowed': dict(self.allowed),
+                'throttled': dict(self.throttled),
+            }
+
+
+class AdmissionControl:
+    """Tracks in-flight work in this worker and sheds ingest when it is too high"""
+    
+    def __init__(self):
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.shed = 0
+    
+    def init_app(self, app):
+        self.max_in_flight = int(app.config.get('RATELIMIT_MAX_IN_FLIGHT', 0))
+        with self._lock:
+            self.in_flight = 0
+            self.peak_in_flight = 0
+            self.shed = 0
+        
+        @app.before_request
+        def track_request():
+            self.enter()
+        
+        @app.teardown_request
+        def untrack_request(exc):
+            self.leave()
+    
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def leave(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+    
+    @contextmanager
+    def track(self):
+        """Count a unit of non-HTTP work (e.g. a socket event) as in flight"""
+        self.enter()
+        try:
+            yield
+        finally:
+            self.leave()
+    
+    @property
+    def load(self):
+        """Fraction of the in-flight threshold currently in use (0 when unlimited)"""
+        if self.max_in_flight <= 0:
+            return 0.0
+        return self.in_flight / self.max_in_flight
+    
+    def should_shed(self):
+        """True if new ingest work should be rejected to protect latency"""
+        if self.max_in_flight <= 0 or self.in_flight <= self.max_in_flight:
+            return False
+        with self._lock:
+            self.shed += 1
+        return True
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'max_in_flight': self.max_in_flight,
+                'shed': self.shed,
+            }
+
+
+rate_limiter = RateLimiter()
+admission = AdmissionControl()
+
+def limit_ingest(fn):
+    """Decorator applying load shedding and the per-user REST limit to an ingest view"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if admission.should_shed():
+            response = jsonify({'message': 'Server is busy, please retry later'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        
+        allowed, retry_after = rate_limiter.hit('rest_user', get_jwt_identity())
+        if not allowed:
+            response = jsonify({'message': 'Too many location updates', 'retry_after': round(retry_after, 2)})
+            response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return response, 429
+        return fn(*args, **kwargs)
+    return wrapper
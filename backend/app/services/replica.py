@@ -0,0 +1,127 @@
+# Routing of read-only requests to a replica database bind
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+REPLICA_BIND = 'replica'
+
+def use_replica(fn):
+    """Decorator marking a view as read-only so its queries may go to the replica"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Decides whether the replica is healthy and fresh enough to serve reads"""
+    
+    def __init__(self):
+        self.max_lag = 5.0
+        self.check_interval = 10.0
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self._checked_at = None
+        self._probing = False
+        self._usable = False
+        self._lag = None
+        self._error = None
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+    
+    def init_app(self, app):
+        self.max_lag = float(app.config.get('REPLICA_MAX_LAG_SECONDS', 5))
+        self.check_interval = float(app.config.get('REPLICA_CHECK_INTERVAL', 10))
+        self._reset()
+    
+    def _measure_lag(self, engine):
+        """Seconds the replica is behind the primary (0 when it cannot lag)"""
+        with engine.connect() as conn:
+            if engine.dialect.name != 'postgresql':
+                conn.execute(text('SELECT 1'))
+                return 0.0
+            # The last replay timestamp keeps ageing while the primary is idle,
+            # so a replica that has replayed everything it received is current
+            lag = conn.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp())) END"
+            )).scalar()
+            # NULL means the server is not replaying WAL, i.e. it is a primary
+            return float(lag) if lag is not None else 0.0
+    
+    def _claim_check(self):
+        """Whether this caller should probe the replica now (at most one at a time)"""
+        now = time.monotonic()
+        if self._probing or (self._checked_at is not None and now - self._checked_at < self.check_interval):
+            return False
+        self._checked_at = now
+        self._probing = True
+        return True
+    
+    def _probe(self, engine):
+        # Runs without the lock: a slow or unreachable replica must not block
+        # other requests, which keep using the last known state meanwhile
+        lag, error = None, 'Replica probe interrupted'
+        try:
+            lag, error = self._measure_lag(engine), None
+        except Exception as e:
+            error = str(e)
+        finally:
+            # Also on BaseExceptions (e.g. gevent.Timeout), or no probe would ever run again
+            with self._lock:
+                self._lag = lag
+                self._error = error
+                self._usable = lag is not None and lag <= self.max_lag
+                self._probing = False
+    
+    def engine_for_reads(self, db):
+        """Return the replica engine if it is usable, otherwise None for the primary"""
+        engine = db.engines.get(REPLICA_BIND)
+        if engine is None:
+            return None
+        
+        with self._lock:
+            probe = self._claim_check()
+        if probe:
+            self._probe(engine)
+        
+        with self._lock:
+            if self._usable:
+                self.replica_reads += 1
+                return engine
+            self.primary_fallbacks += 1
+            return None
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'replica_reads': self.replica_reads,
+                'primary_fallbacks': self.primary_fallbacks,
+                'usable': self._usable,
+                'lag_seconds': self._lag,
+                'last_error': self._error,
+            }
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Session sending reads from views marked with use_replica to the replica bind"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_replica'):
+            # Decided once per request, so related queries (e.g. a page and its
+            # count) never mix the replica and the primary
+            if 'read_engine' not in g:
+                g.read_engine = replica_router.engine_for_reads(self._db)
+            if g.read_engine is not None:
+                return g.read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
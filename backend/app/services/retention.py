@@ -0,0 +1,134 @@
+# Retention policies for location history and abandoned registrations
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def purge_users(user_ids):
+    """Delete users with set-based deletes of their locations and memberships.
+    
+    Nothing is loaded into the session; the caller commits.
+    """
+    from app.models.user import User
+    from app.models.group import GroupMembership
+    from app.services.location_store import location_store
+    
+    if not user_ids:
+        return 0
+    location_store.delete_users(user_ids)
+    GroupMembership.query.filter(GroupMembership.user_id.in_(user_ids))\
+        .delete(synchronize_session=False)
+    return User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+
+
+class Retention:
+    """Applies the configured retention policies in bounded chunks.
+    
+    Locations older than LOCATION_RETENTION_DAYS are pruned through the
+    location repository; unverified users whose verification token expired
+    more than UNVERIFIED_USER_RETENTION_DAYS ago are removed with their
+    data. A zero retention keeps the data forever. With RETENTION_INTERVAL
+    set, a daemon thread runs the policies periodically in this process.
+    """
+    
+    def __init__(self):
+        self.location_days = 0
+        self.unverified_days = 7
+        self.chunk_size = 5000
+        self.interval = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+    
+    def init_app(self, app):
+        self.location_days = float(app.config.get('LOCATION_RETENTION_DAYS', 0))
+        self.unverified_days = float(app.config.get('UNVERIFIED_USER_RETENTION_DAYS', 7))
+        self.chunk_size = int(app.config.get('RETENTION_CHUNK_SIZE', 5000))
+        self.interval = float(app.config.get('RETENTION_INTERVAL', 0))
+    
+    def prune_locations(self, now=None):
+        from app.services.location_store import location_store
+        
+        if self.location_days <= 0:
+            return 0
+        before = (now or datetime.utcnow()) - timedelta(days=self.location_days)
+        return location_store.prune(before, chunk_size=self.chunk_size)
+    
+    def prune_unverified_users(self, now=None):
+        from app import db
+        from app.models.user import User
+        from app.services.user_cache import user_cache
+        
+        if self.unverified_days <= 0:
+            return 0
+        expired_before = (now or datetime.utcnow()) - timedelta(days=self.unverified_days)
+        removed = 0
+        while True:
+            user_ids = [row[0] for row in db.session.query(User.id)
+                        .filter(User.is_verified == False, User.token_expiry < expired_before)
+                        .order_by(User.id)
+                        .limit(self.chunk_size)]
+            if not user_ids:
+                return removed
+            try:
+                purge_users(user_ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            for user_id in user_ids:
+                user_cache.invalidate(user_id)
+            removed += len(user_ids)
+    
+    def run(self, now=None):
+        """Apply every policy once; returns the number of removed rows per policy"""
+        started = time.perf_counter()
+        result = {
+            'locations': self.prune_locations(now),
+            'unverified_users': self.prune_unverified_users(now),
+        }
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.utcnow().isoformat()
+            self.last_result = dict(result, seconds=round(time.perf_counter() - started, 3))
+            self.last_error = None
+        return result
+    
+    def _loop(self, app):
+        while True:
+            time.sleep(self.interval)
+            with app.app_context():
+                try:
+                    self.run()
+                except Exception as e:
+                    with self._lock:
+                        self.last_error = str(e)
+                    logger.error(f"Retention run failed: {str(e)}")
+    
+    def start(self, app):
+        """Run the policies every RETENTION_INTERVAL seconds in a daemon thread"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, args=(app,), name='retention', daemon=True)
+        self._thread.start()
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'location_days': self.location_days,
+                'unverified_days': self.unverified_days,
+                'interval': self.interval,
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'last_result': self.last_result,
+                'last_error': self.last_error,
+            }
+
+
+retention = Retention()
@@ -0,0 +1,35 @@
+# Startup profiling: timings of package imports and create_app phases
+import time
+
+
+class StartupProfile:
+    """Records the time spent between successive marks during application startup"""
+    
+    def __init__(self, import_seconds=None):
+        self.phases = []
+        if import_seconds is not None:
+            self.phases.append(('imports', import_seconds))
+        self._started = time.perf_counter()
+        self._last = self._started
+    
+    def mark(self, phase):
+        """Close the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+    
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+    
+    def report(self):
+        return {
+            'phases': {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+            'total_ms': round(self.total * 1000, 2),
+        }
+    
+    def format(self):
+        lines = ['Startup profile (ms):']
+        lines += [f'  {name:<16} {seconds * 1000:8.1f}' for name, seconds in self.phases]
+        lines.append(f"  {'total':<16} {self.total * 1000:8.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,242 @@
+# Append-only per-user track log files with memory-mapped reads
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from app.services.location_store import (
+    LocationRepository, TRACK_DTYPE, TrackPoint, OPTIONAL_FIELDS, to_epoch, from_epoch
+)
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_NAME = 'index.json'
+
+
+class TrackLogRepository(LocationRepository):
+    """Locations stored as fixed-width records in per-user segment files.
+    
+    Each user has a directory of segments named after the millisecond
+    timestamp of their first record; only the newest segment is appended
+    to and it is rolled once it holds segment_records records. index.json
+    caches the time bounds and record counts of closed segments so range
+    queries only map the segments that overlap the requested window.
+    Records are assumed to be appended in timestamp order (server time).
+    """
+    
+    def __init__(self, directory, segment_records=65536):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+    
+    def _lock(self, user_id):
+        with self._locks_guard:
+            return self._locks.setdefault(int(user_id), threading.Lock())
+    
+    def _user_dir(self, user_id):
+        return os.path.join(self.directory, str(int(user_id)))
+    
+    def _segment_paths(self, user_id):
+        user_dir = self._user_dir(user_id)
+        if not os.path.isdir(user_dir):
+            return []
+        names = sorted(name for name in os.listdir(user_dir) if name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(user_dir, name) for name in names]
+    
+    @staticmethod
+    def _count(path):
+        # A record being appended concurrently is ignored until complete
+        return os.path.getsize(path) // TRACK_DTYPE.itemsize
+    
+    @staticmethod
+    def _map(path, count=None):
+        count = TrackLogRepository._count(path) if count is None else count
+        if count == 0:
+            return np.empty(0, dtype=TRACK_DTYPE)
+        return np.memmap(path, dtype=TRACK_DTYPE, mode='r', shape=(count,))
+    
+    def _load_index(self, user_id):
+        try:
+            with open(os.path.join(self._user_dir(user_id), INDEX_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_index(self, user_id, index):
+        """Best effort: the index is a cache that segments() rebuilds from the files"""
+        user_dir = self._user_dir(user_id)
+        try:
+            # A unique temp file per writer, so concurrent writers never share one
+            fd, tmp_path = tempfile.mkstemp(dir=user_dir, prefix=f'{INDEX_NAME}.', suffix='.tmp')
+        except OSError:
+            return  # the user was deleted meanwhile
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, os.path.join(user_dir, INDEX_NAME))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def segments(self, user_id):
+        """(path, first timestamp, last timestamp, count) of every non-empty segment"""
+        paths = self._segment_paths(user_id)
+        index = self._load_index(user_id)
+        segments = []
+        dirty = False
+        for position, path in enumerate(paths):
+            name = os.path.basename(path)
+            closed = position < len(paths) - 1
+            entry = index.get(name) if closed else None
+            if entry is None:
+                records = self._map(path)
+                if len(records) == 0:
+                    continue
+                entry = [float(records['timestamp'][0]), float(records['timestamp'][-1]), len(records)]
+                if closed:
+                    index[name] = entry
+                    dirty = True
+            segments.append((path, *entry))
+        if dirty:
+            self._save_index(user_id, index)
+        return segments
+    
+    @staticmethod
+    def _record(row):
+        record = np.zeros((), dtype=TRACK_DTYPE)
+        record['timestamp'] = to_epoch(row['timestamp'])
+        record['latitude'] = row['latitude']
+        record['longitude'] = row['longitude']
+        for field in OPTIONAL_FIELDS:
+            value = row.get(field)
+            record[field] = math.nan if value is None else value
+        return record.tobytes()
+    
+    def add_many(self, rows):
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(int(row['user_id']), []).append(row)
+        
+        for user_id, user_rows in by_user.items():
+            with self._lock(user_id):
+                os.makedirs(self._user_dir(user_id), exist_ok=True)
+                paths = self._segment_paths(user_id)
+                for row in user_rows:
+                    if not paths or self._count(paths[-1]) >= self.segment_records:
+                        name = f"{int(to_epoch(row['timestamp']) * 1000):013d}{SEGMENT_SUFFIX}"
+                        paths.append(os.path.join(self._user_dir(user_id), name))
+                    with open(paths[-1], 'ab') as f:
+                        f.write(self._record(row))
+    
+    @staticmethod
+    def _point(user_id, position, record):
+        values = {field: float(record[field]) for field in OPTIONAL_FIELDS}
+        return TrackPoint(
+            id=position + 1,
+            user_id=int(user_id),
+            latitude=float(record['latitude']),
+            longitude=float(record['longitude']),
+            timestamp=from_epoch(float(record['timestamp'])),
+            **{field: None if math.isnan(value) else value for field, value in values.items()}
+        )
+    
+    def latest(self, user_id):
+        segments = self.segments(user_id)
+        if not segments:
+            return None
+        path, _, _, count = segments[-1]
+        total = sum(segment[3] for segment in segments)
+        return self._point(user_id, total - 1, self._map(path, count)[-1])
+    
+    def latest_version(self, user_id):
+        segments = self.segments(user_id)
+        if not segments:
+            return None
+        total = sum(segment[3] for segment in segments)
+        last_timestamp = segments[-1][2]
+        return (total, last_timestamp), from_epoch(last_timestamp)
+    
+    def history(self, user_id, page, per_page):
+        segments = self.segments(user_id)
+        total = sum(segment[3] for segment in segments)
+        # Page through global positions counted from the newest record
+        stop = max(0, total - (page - 1) * per_page)
+        start = max(0, stop - per_page)
+        items = []
+        offset = 0
+        for path, _, _, count in segments:
+            lo, hi = max(start, offset), min(stop, offset + count)
+            if lo < hi:
+                records = self._map(path, count)[lo - offset:hi - offset]
+                items.extend(self._point(user_id, lo + i, record) for i, record in enumerate(records))
+            offset += count
+        items.reverse()
+        return items, total
+    
+    def _slices(self, user_id, start=None, end=None):
+        """(global offset, records) for the parts of each segment inside the window"""
+        start_ts = to_epoch(start) if start is not None else -math.inf
+        end_ts = to_epoch(end) if end is not None else math.inf
+        offset = 0
+        for path, first, last, count in self.segments(user_id):
+            if last >= start_ts and first <= end_ts:
+                records = self._map(path, count)
+                lo = int(np.searchsorted(records['timestamp'], start_ts, side='left'))
+                hi = int(np.searchsorted(records['timestamp'], end_ts, side='right'))
+                if lo < hi:
+                    yield offset + lo, records[lo:hi]
+            offset += count
+    
+    def iter_range(self, user_id, start=None, end=None):
+        for offset, records in self._slices(user_id, start, end):
+            for i, record in enumerate(records):
+                yield self._point(user_id, offset + i, record)
+    
+    def arrays(self, user_id, start=None, end=None):
+        parts = [np.array(records) for _, records in self._slices(user_id, start, end)]
+        if not parts:
+            return np.empty(0, dtype=TRACK_DTYPE)
+        return np.concatenate(parts)
+    
+    def user_ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name) for name in os.listdir(self.directory) if name.isdigit())
+    
+    def delete_user(self, user_id):
+        with self._lock(user_id):
+            shutil.rmtree(self._user_dir(user_id), ignore_errors=True)
+    
+    def prune(self, before, chunk_size=5000):
+        """Unlink whole segments that end before the cutoff.
+        
+        The segment straddling the cutoff is kept intact, so a few records
+        older than the cutoff may survive until their segment expires.
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = to_epoch(before)
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.isdigit():
+                continue
+            user_id = int(name)
+            with self._lock(user_id):
+                segments = self.segments(user_id)
+                # The newest segment is still being appended to
+                expired = [segment for segment in segments[:-1] if segment[2] < cutoff]
+                if not expired:
+                    continue
+                index = self._load_index(user_id)
+                for path, _, _, count in expired:
+                    os.remove(path)
+                    index.pop(os.path.basename(path), None)
+                    removed += count
+                self._save_index(user_id, index)
+        return removed
@@ -0,0 +1,121 @@
+# Per-process TTL + LRU cache of user records for authenticated hot paths
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CachedUser = namedtuple('CachedUser', [
+    'id', 'name', 'email', 'role', 'is_active', 'is_verified', 'is_approved',
+    'created_at', 'updated_at', 'group_ids'
+])
+
+def snapshot(user):
+    """Detached, immutable copy of the user columns the hot paths read"""
+    values = {field: getattr(user, field) for field in CachedUser._fields if field != 'group_ids'}
+    values['group_ids'] = tuple(sorted(m.group_id for m in getattr(user, 'memberships', ())))
+    return CachedUser(**values)
+
+
+class UserCache:
+    """Caches user snapshots by id for a bounded time; writers must invalidate"""
+    
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reset_stats()
+    
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def init_app(self, app):
+        self.maxsize = int(app.config.get('USER_CACHE_SIZE', 1024))
+        self.ttl = float(app.config.get('USER_CACHE_TTL', 30))
+        self.clear()
+        self._reset_stats()
+    
+    def _load(self, user_id):
+        from app import db
+        from app.models.user import User
+        
+        user = db.session.get(User, user_id)
+        return snapshot(user) if user else None
+    
+    def get(self, user_id):
+        """Return the cached user snapshot, loading it on a miss (None if not found)"""
+        user = self.get_cached(user_id)
+        if user is None:
+            try:
+                user_id = int(user_id)
+            except (ValueError, TypeError):
+                return None
+            user = self._load(user_id)
+            if user is not None:
+                self.put(user_id, user)
+        return user
+    
+    def get_cached(self, user_id):
+        """Return the cached user snapshot without loading it (None on a miss)"""
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            return None
+        
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return user
+                del self._entries[user_id]
+                self.expirations += 1
+            self.misses += 1
+        return None
+    
+    def put(self, user_id, user):
+        """Cache a user snapshot loaded by the caller"""
+        if self.maxsize <= 0:
+            return
+        user_id = int(user_id)
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, user_id):
+        """Drop a user from the cache after it was changed or deleted"""
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
@@ -1,10 +1,61 @@
-from flask import request
+import time
+
+from flask import request, current_app
 from flask_socketio import emit, join_room, leave_room, disconnect
 from flask_jwt_extended import decode_token
 from jwt.exceptions import InvalidTokenError
 
 from app.models.user import User
 from app import db
+from app.services.user_cache import user_cache
+from app.services.rate_limit import rate_limiter, admission
+from app.services.broadcast import room_log, is_broadcast_room
+from app.services.groups import broadcast_rooms
+from app.services.rate_hints import rate_hints
+
+# Socket ids per connected user in this worker, used to defer going inactive
+_connections = {}
+
+def _set_inactive(user_id):
+    User.query.filter_by(id=user_id).update({'is_active': False})
+    db.session.commit()
+    user_cache.invalidate(user_id)
+
+def _set_inactive_after_grace(app, user_id, grace):
+    """Mark a user inactive unless they reconnected within the grace period"""
+    time.sleep(grace)
+    if _connections.get(user_id):
+        return
+    with app.app_context():
+        try:
+            _set_inactive(user_id)
+        except Exception:
+            db.session.rollback()
+
+def sync_broadcast_rooms(socketio, user_id):
+    """Move a user's sockets in this worker into their current broadcast rooms.
+    
+    Called after membership changes so a removed member stops receiving (and
+    can no longer resume) the group's updates; affected clients get a resync.
+    """
+    user = user_cache.get(user_id)
+    wanted = set(broadcast_rooms(user)) if user else set()
+    affected = set()
+    for sid in list(_connections.get(str(user_id), ())):
+        current = {room for room in socketio.server.rooms(sid, namespace='/') if is_broadcast_room(room)}
+        if current == wanted:
+            continue
+        for room in current - wanted:
+            socketio.server.leave_room(sid, room, namespace='/')
+        for room in wanted - current:
+            socketio.server.enter_room(sid, room, namespace='/')
+        affected |= rate_hints.join(sid, user_id, wanted)
+        socketio.emit('resync', {'reason': 'membership_changed'}, to=sid)
+    rate_hints.refresh(socketio, affected, _rooms_for_user)
+
+def _rooms_for_user(user_id):
+    user = user_cache.get(user_id)
+    return broadcast_rooms(user) if user else []
 
 def register_socket_events(socketio):
     @socketio.on('connect')
@@ -21,17 +72,26 @@ def register_socket_events(socketio):
             decoded_token = decode_token(token)
             user_id = decoded_token['sub']
             
-            # Update user's active status
-            user = User.query.get(user_id)
+            # Update user's active status, skipping the write if already active
+            user = user_cache.get(user_id)
             if user:
-                user.is_active = True
-                db.session.commit()
+                if not user.is_active:
+                    User.query.filter_by(id=user.id).update({'is_active': True})
+                    db.session.commit()
+                    user_cache.invalidate(user.id)
                 
                 # Join a room specific to this user
                 join_room(f'user_{user_id}')
                 
-                # Join the broadcast room for all users
-                join_room('all_users')
+                # Join the broadcast rooms of the user's groups
+                for room in broadcast_rooms(user):
+                    join_room(room)
+                
+                _connections.setdefault(str(user_id), set()).add(request.sid)
+                
+                # A new viewer may speed up reporting of everyone in its rooms
+                affected = rate_hints.join(request.sid, user_id, broadcast_rooms(user))
+                rate_hints.refresh(socketio, affected, _rooms_for_user)
                 
                 return True  # Accept connection
             
@@ -56,15 +116,30 @@ def register_socket_events(socketio):
                 decoded_token = decode_token(token)
                 user_id = decoded_token['sub']
                 
-                # Update user's active status
-                user = User.query.get(user_id)
+                sids = _connections.get(str(user_id), set())
+                sids.discard(request.sid)
+                
+                # Update user's active status once their last connection is gone,
+                # allowing a grace period for the client to resume
+                user = user_cache.get(user_id)
+                if user and not sids:
+                    _connections.pop(str(user_id), None)
+                    grace = current_app.config.get('SOCKET_RESUME_GRACE', 30)
+                    if grace > 0:
+                        socketio.start_background_task(
+                            _set_inactive_after_grace, current_app._get_current_object(), str(user_id), grace
+                        )
+                    else:
+                        _set_inactive(user.id)
+                
                 if user:
-                    user.is_active = False
-                    db.session.commit()
-                    
                     # Leave rooms
                     leave_room(f'user_{user_id}')
-                    leave_room('all_users')
+                    for room in broadcast_rooms(user):
+                        leave_room(room)
+                
+                # One viewer less: users it was watching may slow down
+                rate_hints.refresh(socketio, rate_hints.leave(request.sid), _rooms_for_user)
         except Exception:
             pass  # Silently handle errors on disconnect
     
@@ -72,6 +147,10 @@ def register_socket_events(socketio):
     @socketio.on('update_location')
     def handle_location_update(data):
         """Handle location update from client"""
+        with admission.track():
+            _handle_location_update(data)
+    
+    def _handle_location_update(data):
         try:
             # Get token from the connection's auth param
             token = request.args.get('token') or getattr(request, 'auth', {}).get('token')
@@ -84,6 +163,16 @@ def register_socket_events(socketio):
             decoded_token = decode_token(token)
             user_id = decoded_token['sub']
             
+            # Shed load and throttle misbehaving clients without disconnecting them
+            if admission.should_shed():
+                emit('throttled', {'reason': 'overloaded', 'retry_after': 1})
+                return
+            for scope, key in (('socket_connection', request.sid), ('socket_user', user_id)):
+                allowed, retry_after = rate_limiter.hit(scope, key)
+                if not allowed:
+                    emit('throttled', {'reason': 'rate_limited', 'retry_after': round(retry_after, 2)})
+                    return
+            
             # Prepare the location data
             location_data = {
                 'userId': user_id,
@@ -93,11 +182,26 @@ def register_socket_events(socketio):
                 'timestamp': data.get('timestamp')
             }
             
-            # Broadcast to all connected clients
-            emit('location_update', location_data, room='all_users', include_self=False)
+            # Fan out to the user's group rooms, sequenced for resume
+            user = user_cache.get(user_id)
+            if not user:
+                disconnect()
+                return
+            for room in broadcast_rooms(user):
+                room_log.publish(socketio, room, 'location_update', location_data, skip_sid=request.sid)
+            
+            # Tell the client how often it should report from now on
+            rate_hints.hint(socketio, user_id, broadcast_rooms(user), speed=data.get('speed'))
             
         except InvalidTokenError:
             disconnect()  # Disconnect on invalid token
         except Exception as e:
             print(f"Socket location update error: {str(e)}")
             disconnect()
+    
+    
+    @socketio.on('resume')
+    def handle_resume(data):
+        """Replay broadcasts missed since the sequence numbers the client last saw"""
+        data = data or {}
+        return room_log.resume(emit, request.sid, data.get('epoch'), data.get('seqs') or {})
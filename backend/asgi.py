@@ -0,0 +1,4 @@
+from app.async_ingest import create_async_app
+
+# Serve with: uvicorn asgi:app --host 0.0.0.0 --port 5001
+app = create_async_app()
@@ -0,0 +1,181 @@
+"""Ingest benchmark: gevent worker vs. the async ingest service on POST /api/locations.
+
+Usage: python benchmarks/ingest.py [--servers gevent,async] [--connections 50,200,800]
+                                   [--duration 10] [--database-url sqlite:///...]
+
+Starts each server as a single process on a scratch SQLite database (or
+the given database), then holds N keep-alive connections that each post
+location fixes back to back for the duration. Reports throughput, p50/p99
+latency and the server CPU used, from which connections per busy core is
+derived. Needs requirements-async.txt and Linux (/proc) for CPU
+accounting; the load generator is a single asyncio process, so watch its
+own CPU when pushing the connection count high.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+SERVERS = {
+    'gevent': lambda port: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+        '--worker-class', 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker', 'wsgi:app'
+    ],
+    'async': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', '1', '--log-level', 'warning', '--no-access-log'
+    ],
+}
+
+SETUP = """
+import json
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+app = create_app()
+tokens = []
+with app.app_context():
+    db.create_all(bind_key=None)
+    for i in range({users}):
+        email = f'bench{{i}}@example.com'
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            user = User(name=f'bench{{i}}', email=email, password='x', is_verified=True, is_approved=True)
+            db.session.add(user)
+            db.session.commit()
+        tokens.append(create_access_token(identity=str(user.id)))
+print(json.dumps(tokens))
+"""
+
+def create_users(env, count):
+    output = subprocess.run(
+        [sys.executable, '-c', SETUP.format(users=count)], cwd=BACKEND_DIR, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process and all its descendants"""
+    total = 0.0
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        total += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                total += sum(cpu_seconds(int(child)) for child in f.read().split())
+    except OSError:
+        pass
+    return total
+
+async def wait_ready(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+async def client(port, token, deadline, latencies, errors):
+    """One keep-alive connection posting fixes until the deadline"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps({'lat': 47.37, 'lng': 8.54, 'accuracy': 5.0, 'speed': 1.5}).encode()
+    request = (
+        f'POST /api/locations HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'
+    ).encode() + body
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if not status_line.split()[1:2] == [b'201']:
+                errors.append(status_line)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        errors.append(str(e))
+    finally:
+        writer.close()
+
+async def run_level(port, tokens, connections, duration, pid):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    cpu_before = cpu_seconds(pid)
+    started = time.monotonic()
+    await asyncio.gather(*(
+        client(port, tokens[i % len(tokens)], deadline, latencies, errors) for i in range(connections)
+    ))
+    elapsed = time.monotonic() - started
+    cores = (cpu_seconds(pid) - cpu_before) / elapsed
+    latencies.sort()
+    return {
+        'connections': connections,
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2) if latencies else None,
+        'errors': len(errors),
+        'server_cores': round(cores, 2),
+        'connections_per_core': round(connections / cores, 1) if cores else None,
+    }
+
+def bench_server(name, env, tokens, levels, duration, port):
+    process = subprocess.Popen(SERVERS[name](port), cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(port))
+        return [asyncio.run(run_level(port, tokens, level, duration, process.pid)) for level in levels]
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default='gevent,async')
+    parser.add_argument('--connections', default='50,200,800')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    scratch = tempfile.mkdtemp(prefix='ingest-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+        JWT_SECRET_KEY='bench-jwt-secret-key-long-enough-for-hs256',
+        RATELIMIT_REST_RATE='1000000', RATELIMIT_REST_BURST='1000000',
+        SOCKET_RESUME_GRACE='0', AUTO_CREATE_SCHEMA='False',
+    )
+    tokens = create_users(env, args.users)
+    levels = [int(level) for level in args.connections.split(',')]
+    
+    print(f"{'server':<8} {'conns':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'cores':>6} {'conns/core':>11}")
+    for name in args.servers.split(','):
+        for result in bench_server(name, env, tokens, levels, args.duration, args.port):
+            print(f"{name:<8} {result['connections']:>6} {result['requests_per_s']:>9} {result['p50_ms']!s:>8} "
+                  f"{result['p99_ms']!s:>8} {result['errors']:>7} {result['server_cores']:>6} "
+                  f"{result['connections_per_core']!s:>11}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
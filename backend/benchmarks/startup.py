@@ -0,0 +1,59 @@
+"""Cold-start benchmark: fresh interpreter importing the app and running create_app.
+
+Usage: python benchmarks/startup.py [--runs 5] [--target-ms 800]
+
+Each run spawns a new Python process with STARTUP_PROFILE enabled and
+parses its phase report. Exits non-zero if the median total exceeds the
+target, so it can guard against startup regressions in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+from app.services.metrics import collect
+class Config:
+    SECRET_KEY = 'bench'
+    JWT_SECRET_KEY = 'bench-jwt-secret-key-long-enough-for-hs256'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    AUTO_CREATE_SCHEMA = False
+app = create_app(Config)
+wall = time.perf_counter() - started
+with app.app_context():
+    report = collect()['startup']
+report['wall_ms'] = round(wall * 1000, 2)
+print(json.dumps(report))
+"""
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, check=True,
+        capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=800)
+    args = parser.parse_args()
+    
+    reports = [run_once() for _ in range(args.runs)]
+    phases = reports[0]['phases'].keys()
+    print(f"{'phase':<16} {'median ms':>10}")
+    for phase in phases:
+        print(f"{phase:<16} {statistics.median(r['phases'][phase] for r in reports):>10.1f}")
+    wall = statistics.median(r['wall_ms'] for r in reports)
+    print(f"{'wall':<16} {wall:>10.1f}  (target {args.target_ms:.0f})")
+    return 0 if wall <= args.target_ms else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
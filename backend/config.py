@@ -4,6 +4,24 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ['true', 'yes', '1']
+
+def engine_options(database_uri, connect_timeout=None):
+    """Build SQLAlchemy engine options for the given database URI"""
+    options = {
+        'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+    }
+    # SQLite uses single-connection pools that reject sizing arguments
+    if not database_uri.startswith('sqlite'):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE') or 10)
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+        options['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+        if connect_timeout:
+            options['connect_args'] = {'connect_timeout': connect_timeout}
+    return options
+
 class Config:
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change-in-production'
@@ -12,6 +30,98 @@ class Config:
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    
+    # Optional read replica for history and admin listings
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {
+        # Fail fast when the replica is unreachable so reads fall back to the primary
+        'replica': {
+            'url': REPLICA_DATABASE_URL,
+            **engine_options(REPLICA_DATABASE_URL, int(os.environ.get('REPLICA_CONNECT_TIMEOUT') or 2))
+        }
+    } if REPLICA_DATABASE_URL else {}
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS') or 5)
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL') or 10)
+    
+    # Make psycopg2 yield to the gevent hub instead of blocking it
+    DB_GEVENT_WAIT_CALLBACK = env_bool('DB_GEVENT_WAIT_CALLBACK', True)
+    
+    # Create tables on boot; production runs `flask create-schema` once per deploy instead
+    AUTO_CREATE_SCHEMA = env_bool('AUTO_CREATE_SCHEMA', True)
+    # Print import and create_app phase timings when a worker starts
+    STARTUP_PROFILE = env_bool('STARTUP_PROFILE', False)
+    
+    # User identity cache (per worker process)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL') or 30)
+    
+    # Response compression (brotli when installed, otherwise gzip)
+    COMPRESS_RESPONSES = env_bool('COMPRESS_RESPONSES', True)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    
+    # Location ingest rate limits: tokens per second and bucket size
+    RATELIMIT_ENABLED = env_bool('RATELIMIT_ENABLED', True)
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL')  # e.g. redis://redis:6379/0
+    RATELIMIT_REST_RATE = float(os.environ.get('RATELIMIT_REST_RATE') or 1)
+    RATELIMIT_REST_BURST = float(os.environ.get('RATELIMIT_REST_BURST') or 5)
+    RATELIMIT_SOCKET_USER_RATE = float(os.environ.get('RATELIMIT_SOCKET_USER_RATE') or 2)
+    RATELIMIT_SOCKET_USER_BURST = float(os.environ.get('RATELIMIT_SOCKET_USER_BURST') or 10)
+    RATELIMIT_SOCKET_CONNECTION_RATE = float(os.environ.get('RATELIMIT_SOCKET_CONNECTION_RATE') or 2)
+    RATELIMIT_SOCKET_CONNECTION_BURST = float(os.environ.get('RATELIMIT_SOCKET_CONNECTION_BURST') or 10)
+    # Shed ingest when more requests/events than this are in flight (0 disables)
+    RATELIMIT_MAX_IN_FLIGHT = int(os.environ.get('RATELIMIT_MAX_IN_FLIGHT') or 0)
+    
+    # Socket resume: broadcasts kept per room and seconds before a dropped user goes inactive
+    BROADCAST_BUFFER_SIZE = int(os.environ.get('BROADCAST_BUFFER_SIZE') or 256)
+    SOCKET_RESUME_GRACE = float(os.environ.get('SOCKET_RESUME_GRACE') or 30)
+    
+    # Location ingest: 'inline' writes in the web worker, 'queue' hands fixes to ingest.py
+    INGEST_MODE = os.environ.get('INGEST_MODE', 'inline')
+    INGEST_QUEUE_PATH = os.environ.get('INGEST_QUEUE_PATH')  # defaults to instance/ingest-queue.db
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE') or 500)
+    INGEST_POLL_INTERVAL = float(os.environ.get('INGEST_POLL_INTERVAL') or 0.5)
+    INGEST_MAX_BACKOFF = float(os.environ.get('INGEST_MAX_BACKOFF') or 30)
+    INGEST_QUEUE_BUSY_TIMEOUT = float(os.environ.get('INGEST_QUEUE_BUSY_TIMEOUT') or 5)  # seconds
+    
+    # Location history storage: 'sql' rows or 'tracklog' append-only segment files
+    LOCATION_BACKEND = os.environ.get('LOCATION_BACKEND', 'sql')
+    TRACKLOG_DIR = os.environ.get('TRACKLOG_DIR')  # defaults to instance/tracklog
+    TRACKLOG_SEGMENT_RECORDS = int(os.environ.get('TRACKLOG_SEGMENT_RECORDS') or 65536)
+    
+    # Async ingest service (asgi.py); derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URI')  # e.g. postgresql+asyncpg://...
+    
+    # Client reporting interval hints in seconds (unwatched users use the maximum)
+    RATE_HINT_MIN_INTERVAL = float(os.environ.get('RATE_HINT_MIN_INTERVAL') or 5)
+    RATE_HINT_STATIONARY_INTERVAL = float(os.environ.get('RATE_HINT_STATIONARY_INTERVAL') or 30)
+    RATE_HINT_MAX_INTERVAL = float(os.environ.get('RATE_HINT_MAX_INTERVAL') or 120)
+    RATE_HINT_MOVING_SPEED = float(os.environ.get('RATE_HINT_MOVING_SPEED') or 1.0)  # m/s
+    
+    # Retention in days (0 keeps forever) and the in-process schedule in seconds
+    # (0 disables it; enable it on a single process, `flask prune` works anywhere)
+    LOCATION_RETENTION_DAYS = float(os.environ.get('LOCATION_RETENTION_DAYS') or 0)
+    UNVERIFIED_USER_RETENTION_DAYS = float(os.environ.get('UNVERIFIED_USER_RETENTION_DAYS') or 7)
+    RETENTION_CHUNK_SIZE = int(os.environ.get('RETENTION_CHUNK_SIZE') or 5000)
+    RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL') or 0)
+    
+    # Development query profiling: per-request counts, N+1 and slow statement warnings
+    QUERY_PROFILE = env_bool('QUERY_PROFILE', False)
+    QUERY_PROFILE_HEADER = env_bool('QUERY_PROFILE_HEADER', True)  # X-Query-Profile / Server-Timing
+    QUERY_PROFILE_SLOW_MS = float(os.environ.get('QUERY_PROFILE_SLOW_MS') or 100)
+    QUERY_PROFILE_REPEAT_THRESHOLD = int(os.environ.get('QUERY_PROFILE_REPEAT_THRESHOLD') or 5)
+    
+    # Heatmap tiles: histogram cells per tile side (divides 256), fixes per cell at full
+    # colour, deepest zoom served, and the rendered tile cache. New fixes only mark cached
+    # tiles up to HEATMAP_COARSE_ZOOM dirty; those re-render at most every REFRESH_INTERVAL s
+    HEATMAP_BINS = int(os.environ.get('HEATMAP_BINS') or 64)
+    HEATMAP_SATURATION = float(os.environ.get('HEATMAP_SATURATION') or 100)
+    HEATMAP_MAX_ZOOM = int(os.environ.get('HEATMAP_MAX_ZOOM') or 18)
+    HEATMAP_CACHE_SIZE = int(os.environ.get('HEATMAP_CACHE_SIZE') or 2048)
+    HEATMAP_CACHE_TTL = float(os.environ.get('HEATMAP_CACHE_TTL') or 300)
+    HEATMAP_COARSE_ZOOM = int(os.environ.get('HEATMAP_COARSE_ZOOM') or 10)
+    HEATMAP_REFRESH_INTERVAL = float(os.environ.get('HEATMAP_REFRESH_INTERVAL') or 60)
     
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-dev-key-please-change'
@@ -28,9 +138,11 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    QUERY_PROFILE = env_bool('QUERY_PROFILE', True)
     
 class ProductionConfig(Config):
     DEBUG = False
+    AUTO_CREATE_SCHEMA = env_bool('AUTO_CREATE_SCHEMA', False)
     
     # In production, ensure all security settings are properly configured
     # and environment variables are set
@@ -0,0 +1,7 @@
+from app import create_app
+from app.services.ingest_queue import run_ingest_worker
+
+app = create_app()
+
+if __name__ == "__main__":
+    run_ingest_worker(app)
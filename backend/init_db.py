@@ -6,6 +6,9 @@ import getpass
 
 app = create_app()
 with app.app_context():
+    # Production workers no longer create tables on boot
+    db.create_all(bind_key=None)
+    
     # Prompt for admin credentials
     print("\n=== Admin User Setup ===")
     while True:
@@ -0,0 +1,41 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models.user import User
+from tests.helpers import TestConfig
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a verified, approved user and return (user_id, auth headers)"""
+    def _make_user(email='user@example.com', role='user', is_active=True):
+        with app.app_context():
+            user = User(
+                name=email.split('@')[0],
+                email=email,
+                password='not-a-real-hash',
+                role=role,
+                is_active=is_active,
+                is_verified=True,
+                is_approved=True
+            )
+            db.session.add(user)
+            db.session.commit()
+            token = create_access_token(identity=str(user.id), additional_claims={'role': role})
+            return user.id, {'Authorization': f'Bearer {token}'}
+    return _make_user
@@ -0,0 +1,9 @@
+# Shared test configuration, importable by test modules (conftest is not)
+
+
+class TestConfig:
+    TESTING = True
+    SECRET_KEY = 'test-secret'
+    JWT_SECRET_KEY = 'test-jwt-secret-key-long-enough-for-hs256'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
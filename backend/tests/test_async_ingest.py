@@ -0,0 +1,71 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models.location import Location
+from app.models.user import User
+from tests.helpers import TestConfig
+
+pytest.importorskip('aiosqlite')
+
+from app.async_ingest import async_database_uri, create_async_app
+
+
+def _post(service, path, body, headers=()):
+    """Drive one HTTP request through the ASGI app; returns (status, json body)"""
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode(), 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0)
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': list(headers), 'query_string': b''}
+    asyncio.run(service(scope, receive, send))
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+def test_async_database_uri_selects_async_drivers():
+    assert async_database_uri('postgres://u:p@db/tracker') == 'postgresql+asyncpg://u:p@db/tracker'
+    assert async_database_uri('sqlite:////data/app.db') == 'sqlite+aiosqlite:////data/app.db'
+
+
+def test_async_service_stores_location_with_shared_jwt(tmp_path):
+    class Config(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+    
+    service = create_async_app(Config)
+    app = service.flask_app
+    with app.app_context():
+        user = User(name='rider', email='rider@example.com', password='x', is_verified=True, is_approved=True)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        token = create_access_token(identity=str(user_id))
+        expired_token = create_access_token(identity=str(user_id), expires_delta=timedelta(seconds=-1))
+    
+    status, _ = _post(service, '/api/locations', {'lat': 1.0, 'lng': 2.0})
+    assert status == 401
+    expired = [(b'authorization', f'Bearer {expired_token}'.encode())]
+    status, body = _post(service, '/api/locations', {'lat': 1.0, 'lng': 2.0}, expired)
+    assert (status, body['msg']) == (401, 'Token has expired')
+    
+    auth = [(b'authorization', f'Bearer {token}'.encode())]
+    status, body = _post(service, '/api/locations', {'lat': 1.0, 'lng': 2.0, 'speed': 3.0}, auth)
+    assert status == 201
+    assert body['rate_hint']['viewers'] == 0
+    
+    status, body = _post(service, '/api/locations', {'lat': 100.0, 'lng': 2.0}, auth)
+    assert status == 400
+    
+    with app.app_context():
+        assert Location.query.filter_by(user_id=user_id).count() == 1
+        assert db.session.get(User, user_id).is_active
+        db.session.remove()
+        db.drop_all(bind_key=None)
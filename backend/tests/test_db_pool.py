@@ -0,0 +1,25 @@
+from config import engine_options
+
+
+def test_engine_options_size_pool_for_server_databases(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '5')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '7')
+    options = engine_options('postgresql://db/outdoortracker')
+    assert options['pool_size'] == 5
+    assert options['max_overflow'] == 7
+    assert options['pool_pre_ping'] is True
+
+
+def test_engine_options_skip_sizing_for_sqlite():
+    options = engine_options('sqlite:///app.db')
+    assert 'pool_size' not in options
+    assert 'max_overflow' not in options
+
+
+def test_admin_metrics_report_pool_usage(client, make_user):
+    _, headers = make_user('admin@example.com', role='admin')
+    response = client.get('/api/admin/metrics', headers=headers)
+    assert response.status_code == 200
+    pool = response.get_json()['db_pool']
+    assert 'default' in pool['engines']
+    assert pool['counters']['checkouts'] >= 1
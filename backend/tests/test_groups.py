@@ -0,0 +1,86 @@
+def _create_group(client, headers, name):
+    response = client.post('/api/admin/groups', json={'name': name}, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['group']['id']
+
+
+def test_history_and_active_lists_are_scoped_to_groups(client, make_user):
+    _, admin = make_user('admin@example.com', role='admin')
+    alice_id, alice = make_user('alice@example.com')
+    bob_id, bob = make_user('bob@example.com')
+    carol_id, carol = make_user('carol@example.com')
+    
+    hikers = _create_group(client, admin, 'Hikers')
+    bikers = _create_group(client, admin, 'Bikers')
+    client.put(f'/api/admin/groups/{hikers}/members/{alice_id}', headers=admin)
+    client.put(f'/api/admin/groups/{hikers}/members/{bob_id}', headers=admin)
+    client.put(f'/api/admin/groups/{bikers}/members/{carol_id}', headers=admin)
+    
+    active = client.get('/api/users/active', headers=alice).get_json()
+    assert [user['id'] for user in active] == [bob_id]
+    
+    assert client.get(f'/api/locations/user/{bob_id}', headers=alice).status_code == 200
+    assert client.get(f'/api/locations/user/{carol_id}', headers=alice).status_code == 403
+    assert client.get(f'/api/locations/user/{carol_id}', headers=admin).status_code == 200
+    
+    members = client.get(f'/api/groups/{hikers}/members', headers=bob).get_json()
+    assert {user['id'] for user in members} == {alice_id, bob_id}
+    assert client.get(f'/api/groups/{bikers}/members', headers=bob).status_code == 403
+
+
+def test_removing_membership_changes_active_list_etag(client, make_user):
+    _, admin = make_user('admin@example.com', role='admin')
+    alice_id, alice = make_user('alice@example.com')
+    bob_id, _ = make_user('bob@example.com')
+    hikers = _create_group(client, admin, 'Hikers')
+    client.put(f'/api/admin/groups/{hikers}/members/{alice_id}', headers=admin)
+    client.put(f'/api/admin/groups/{hikers}/members/{bob_id}', headers=admin)
+    
+    first = client.get('/api/users/active', headers=alice)
+    client.delete(f'/api/admin/groups/{hikers}/members/{bob_id}', headers=admin)
+    second = client.get('/api/users/active', headers={**alice, 'If-None-Match': first.headers['ETag']})
+    
+    assert second.status_code == 200
+    assert second.get_json() == []
+
+
+def test_active_list_etag_follows_the_groups_the_body_was_built_from(app, client, make_user):
+    from app import db
+    from app.models.group import GroupMembership
+    from app.services.user_cache import user_cache
+    
+    _, admin = make_user('admin@example.com', role='admin')
+    alice_id, alice = make_user('alice@example.com')
+    bob_id, _ = make_user('bob@example.com')
+    hikers = _create_group(client, admin, 'Hikers')
+    client.put(f'/api/admin/groups/{hikers}/members/{bob_id}', headers=admin)
+    client.get('/api/users/active', headers=alice)
+    
+    # Another worker adds alice to the group; this worker's cache is not invalidated
+    with app.app_context():
+        db.session.add(GroupMembership(group_id=hikers, user_id=alice_id))
+        db.session.commit()
+    stale = client.get('/api/users/active', headers=alice)
+    
+    user_cache.clear()
+    fresh = client.get('/api/users/active', headers={**alice, 'If-None-Match': stale.headers['ETag']})
+    assert fresh.status_code == 200
+    assert [user['id'] for user in fresh.get_json()] == [bob_id]
+
+
+def test_removed_member_sockets_leave_the_group_room(app, client, make_user):
+    from flask_jwt_extended import create_access_token
+    from app import socketio
+    
+    _, admin = make_user('admin@example.com', role='admin')
+    alice_id, _ = make_user('alice@example.com')
+    hikers = _create_group(client, admin, 'Hikers')
+    client.put(f'/api/admin/groups/{hikers}/members/{alice_id}', headers=admin)
+    with app.app_context():
+        token = create_access_token(identity=str(alice_id))
+    alice = socketio.test_client(app, query_string=f'token={token}')
+    assert set(alice.emit('resume', {}, callback=True)['rooms']) == {f'group_{hikers}'}
+    
+    client.delete(f'/api/admin/groups/{hikers}/members/{alice_id}', headers=admin)
+    assert set(alice.emit('resume', {}, callback=True)['rooms']) == {'all_users'}
+    alice.disconnect()
@@ -0,0 +1,98 @@
+import struct
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from app.services import metrics
+from app.services.heatmap import bin_tile, heatmap_tiles, render_png, tile_bounds, tile_of, TILE_SIZE
+from app.services.location_store import LocationRepository, location_store
+
+
+def _alpha(png):
+    """Alpha channel of a PNG written by render_png"""
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    width, height = struct.unpack('>II', png[16:24])
+    idat_length = struct.unpack('>I', png[33:37])[0]
+    raw = np.frombuffer(zlib.decompress(png[41:41 + idat_length]), dtype=np.uint8)
+    return raw.reshape(height, width * 4 + 1)[:, 1:].reshape(height, width, 4)[:, :, 3]
+
+
+def test_points_are_binned_into_their_tile():
+    lat = np.array([47.3769, 47.3770, 47.3769, 10.0])
+    lng = np.array([8.5417, 8.5418, 8.5417, 10.0])
+    x, y = tile_of(47.3769, 8.5417, 12)
+    
+    counts = bin_tile(lat, lng, 12, x, y, bins=64)
+    assert counts.sum() == 3
+    
+    alpha = _alpha(render_png(counts, saturation=100))
+    assert alpha.shape == (TILE_SIZE, TILE_SIZE)
+    assert (alpha > 0).sum() == 4 ** 2 * np.count_nonzero(counts)
+
+
+def test_sql_binning_matches_numpy_binning(app, make_user):
+    user_id, _ = make_user()
+    rng = np.random.default_rng(7)
+    x, y = tile_of(47.3769, 8.5417, 9)
+    south, west, north, east = tile_bounds(9, x, y)
+    rows = [
+        {'user_id': user_id, 'latitude': lat, 'longitude': lng, 'timestamp': datetime(2024, 1, 1)}
+        for lat, lng in zip(rng.uniform(south - 0.1, north, 500), rng.uniform(west, east + 0.1, 500))
+    ]
+    
+    with app.app_context():
+        location_store.add_many(rows)
+        db.session.commit()
+        repository = location_store.repository
+        counts = repository.density(9, x, y, 16)
+        assert counts.sum() > 0
+        assert np.array_equal(counts, LocationRepository.density(repository, 9, x, y, 16))
+
+
+def test_tile_endpoint_caches_and_refreshes_on_new_fixes(app, client, make_user):
+    _, admin = make_user('admin@example.com', role='admin')
+    _, rider = make_user('rider@example.com')
+    client.post('/api/locations', json={'lat': 47.3769, 'lng': 8.5417}, headers=rider)
+    coarse = '/api/admin/heatmap/10/{}/{}.png'.format(*tile_of(47.3769, 8.5417, 10))
+    fine = '/api/admin/heatmap/14/{}/{}.png'.format(*tile_of(47.3769, 8.5417, 14))
+    
+    first = client.get(coarse, headers=admin)
+    assert first.status_code == 200 and first.mimetype == 'image/png'
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert _alpha(first.data).any()
+    assert client.get(coarse, headers=dict(admin, **{'If-None-Match': first.headers['ETag']})).status_code == 304
+    client.get(fine, headers=admin)
+    
+    # Fine zooms are evicted at once, coarse ones served until the refresh interval passes
+    client.post('/api/locations', json={'lat': 47.3770, 'lng': 8.5418}, headers=rider)
+    assert client.get(coarse, headers=admin).data == first.data
+    client.get(fine, headers=admin)
+    heatmap_tiles.refresh_interval = 0
+    assert client.get(coarse, headers=admin).data != first.data
+    with app.app_context():
+        stats = metrics.collect()['heatmap']
+    assert (stats['hits'], stats['misses'], stats['invalidations'], stats['refreshes']) == (2, 4, 1, 1)
+    
+    group = client.post('/api/admin/groups', json={'name': 'Empty'}, headers=admin).get_json()['group']['id']
+    empty = client.get(f'{coarse}?group_id={group}', headers=admin)
+    assert not _alpha(empty.data).any()
+    
+    assert client.get('/api/admin/heatmap/2/4/0.png', headers=admin).status_code == 404
+    assert client.get(coarse, headers=rider).status_code == 403
+
+
+def test_cache_invalidation_waits_for_the_commit(app, make_user, monkeypatch):
+    user_id, _ = make_user()
+    seen = []
+    monkeypatch.setattr(location_store, '_listeners', [seen.append])
+    row = {'user_id': user_id, 'latitude': 47.0, 'longitude': 8.0, 'timestamp': datetime(2024, 1, 1)}
+    
+    with app.app_context():
+        location_store.add(row)
+        assert seen == []
+        db.session.rollback()
+        location_store.add(row)
+        db.session.commit()
+    assert seen == [[row]]
@@ -0,0 +1,50 @@
+import gzip
+
+from app import db
+from app.models.location import Location
+
+
+def test_latest_location_revalidates_with_etag(app, client, make_user):
+    user_id, headers = make_user()
+    with app.app_context():
+        db.session.add(Location(user_id=user_id, latitude=47.0, longitude=8.0))
+        db.session.commit()
+    
+    first = client.get(f'/api/locations/latest/{user_id}', headers=headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    
+    cached = client.get(f'/api/locations/latest/{user_id}', headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    
+    with app.app_context():
+        db.session.add(Location(user_id=user_id, latitude=47.1, longitude=8.1))
+        db.session.commit()
+    
+    changed = client.get(f'/api/locations/latest/{user_id}', headers={**headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_active_users_etag_changes_when_user_is_deactivated(client, make_user):
+    _, headers = make_user()
+    _, admin_headers = make_user('admin@example.com', role='admin')
+    other_id, _ = make_user('other@example.com')
+    
+    etag = client.get('/api/users/active', headers=headers).headers['ETag']
+    assert client.get('/api/users/active', headers={**headers, 'If-None-Match': etag}).status_code == 304
+    
+    client.put(f'/api/admin/users/{other_id}/toggle-active', headers=admin_headers)
+    response = client.get('/api/users/active', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_large_responses_are_gzipped(client, make_user):
+    _, admin_headers = make_user('admin@example.com', role='admin')
+    for i in range(20):
+        make_user(f'user{i}@example.com')
+    
+    response = client.get('/api/admin/users', headers={**admin_headers, 'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.data)) > len(response.data)
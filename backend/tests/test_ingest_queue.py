@@ -0,0 +1,57 @@
+from app.models.location import Location
+from app.services.ingest_queue import IngestQueue, drain_once, ingest_queue
+
+
+def test_queue_survives_reopen_and_acks_in_order(tmp_path):
+    queue = IngestQueue(str(tmp_path / 'queue.db'))
+    for i in range(3):
+        queue.put({'n': i})
+    queue.close()
+    
+    reopened = IngestQueue(str(tmp_path / 'queue.db'))
+    batch = reopened.get_batch(limit=2)
+    assert [fix['n'] for _, fix in batch] == [0, 1]
+    reopened.ack(batch[-1][0])
+    assert [fix['n'] for _, fix in reopened.get_batch()] == [2]
+
+
+def test_queued_fixes_are_bulk_inserted_by_drain(app, client, make_user, tmp_path):
+    app.config['INGEST_MODE'] = 'queue'
+    ingest_queue.path = str(tmp_path / 'queue.db')
+    user_id, headers = make_user(is_active=False)
+    
+    for lat in (47.0, 47.1):
+        response = client.post('/api/locations', json={'lat': lat, 'lng': 8.0}, headers=headers)
+        assert response.status_code == 202
+    
+    with app.app_context():
+        assert Location.query.count() == 0
+        assert drain_once(ingest_queue) == 2
+        assert [l.latitude for l in Location.query.order_by(Location.id)] == [47.0, 47.1]
+    assert ingest_queue.depth() == 0
+    ingest_queue.close()
+
+
+def test_rejected_fix_is_dead_lettered_without_blocking_the_queue(app, make_user, tmp_path):
+    queue = IngestQueue(str(tmp_path / 'queue.db'))
+    user_id, _ = make_user()
+    fix = {'user_id': user_id, 'longitude': 8.0, 'timestamp': '2024-01-01T12:00:00'}
+    queue.put(dict(fix, latitude=47.0))
+    queue.put(dict(fix, latitude=None))
+    queue.put(dict(fix, latitude=47.2))
+    
+    with app.app_context():
+        assert drain_once(queue) == 2
+        assert [l.latitude for l in Location.query.order_by(Location.id)] == [47.0, 47.2]
+    assert queue.depth() == 0
+    [(_, parked, error)] = queue.dead_letters()
+    assert parked['latitude'] is None and 'NOT NULL' in error
+    assert queue.metrics()['dead_letters'] == 1
+    queue.close()
+
+
+def test_invalid_fix_is_rejected(client, make_user):
+    _, headers = make_user()
+    response = client.post('/api/locations', json={'lat': 123.0}, headers=headers)
+    assert response.status_code == 400
+    assert set(response.get_json()['errors']) == {'lat', 'lng'}
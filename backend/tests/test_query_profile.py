@@ -0,0 +1,48 @@
+import pytest
+from flask import jsonify
+
+from app import create_app, db
+from app.models.user import User
+from app.services import metrics
+from tests.helpers import TestConfig
+
+
+class ProfiledConfig(TestConfig):
+    QUERY_PROFILE = True
+    QUERY_PROFILE_REPEAT_THRESHOLD = 3
+
+
+@pytest.fixture
+def app():
+    app = create_app(ProfiledConfig)
+    
+    @app.route('/test/lazy-locations')
+    def lazy_locations():
+        # Touches the lazy relationship once per user, the classic N+1
+        return jsonify({user.email: len(user.locations) for user in User.query.all()})
+    
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+def test_lazy_relationship_per_row_is_flagged(app, client, make_user):
+    for i in range(4):
+        make_user(f'user{i}@example.com')
+    
+    response = client.get('/test/lazy-locations')
+    assert 'n_plus_one=1' in response.headers['X-Query-Profile']
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    with app.app_context():
+        assert metrics.collect()['query_profile']['GET /test/lazy-locations']['n_plus_one'] == 1
+
+
+def test_group_listing_loads_memberships_in_one_query(client, make_user):
+    _, admin = make_user('admin@example.com', role='admin')
+    for name in ('A', 'B', 'C', 'D'):
+        client.post('/api/admin/groups', json={'name': name}, headers=admin)
+    
+    response = client.get('/api/admin/groups', headers=admin)
+    assert response.status_code == 200
+    assert 'n_plus_one=0' in response.headers['X-Query-Profile']
@@ -0,0 +1,53 @@
+from flask_jwt_extended import create_access_token
+
+from app import socketio
+from app.services.rate_hints import RateHints, rate_hints
+
+
+def test_interval_depends_on_viewers_speed_and_load():
+    hints = RateHints()
+    
+    assert hints.interval(0, speed=5.0) == hints.max_interval
+    assert hints.interval(2, speed=5.0) == hints.min_interval
+    assert hints.interval(2, speed=0.2) == hints.stationary_interval
+    assert hints.interval(2, speed=None, load=1.0) == hints.stationary_interval * 2
+    assert hints.interval(2, speed=0.0, load=10.0) == hints.max_interval
+
+
+def test_viewer_counts_follow_sockets_joining_and_leaving_rooms():
+    hints = RateHints()
+    
+    assert hints.join('a1', 1, ['group_1', 'group_2']) == {'1'}
+    assert hints.join('b1', 2, ['group_1']) == {'1', '2'}
+    hints.join('b2', 2, ['group_1'])
+    assert hints.viewers(1, ['group_1', 'group_2']) == 2
+    assert hints.viewers(2, ['group_1']) == 1
+    
+    # Moving a socket between rooms touches the users of both
+    assert hints.join('a1', 1, ['group_2']) == {'1', '2'}
+    assert hints.viewers(2, ['group_1']) == 0
+    assert hints.leave('b1') == {'2'}
+    assert hints.leave('b1') == set()
+    assert hints.viewers(1, ['group_1', 'group_2']) == 1
+
+
+def test_location_fix_returns_hint_for_watched_user(app, client, make_user):
+    app.config['SOCKET_RESUME_GRACE'] = 0
+    watcher_id, _ = make_user('watcher@example.com')
+    rider_id, rider_headers = make_user('rider@example.com')
+    
+    response = client.post('/api/locations', json={'lat': 1.0, 'lng': 2.0, 'speed': 3.0}, headers=rider_headers)
+    assert response.get_json()['rate_hint'] == {'interval': rate_hints.max_interval, 'viewers': 0}
+    
+    with app.app_context():
+        watcher_token = create_access_token(identity=str(watcher_id))
+    watcher = socketio.test_client(app, query_string=f'token={watcher_token}')
+    
+    response = client.post('/api/locations', json={'lat': 1.0, 'lng': 2.0, 'speed': 3.0}, headers=rider_headers)
+    hint = response.get_json()['rate_hint']
+    assert hint['viewers'] == 1
+    assert hint['interval'] < rate_hints.max_interval
+    
+    watcher.disconnect()
+    response = client.post('/api/locations', json={'lat': 1.0, 'lng': 2.0}, headers=rider_headers)
+    assert response.get_json()['rate_hint']['viewers'] == 0
@@ -0,0 +1,51 @@
+from app.services import rate_limit
+from app.services.rate_limit import MemoryStorage, admission, rate_limiter
+
+
+def test_token_bucket_refills_at_rate():
+    storage = MemoryStorage()
+    assert storage.take('k', rate=1, burst=2, now=0) == (True, 0.0)
+    assert storage.take('k', rate=1, burst=2, now=0) == (True, 0.0)
+    allowed, retry_after = storage.take('k', rate=1, burst=2, now=0)
+    assert not allowed and retry_after == 1.0
+    assert storage.take('k', rate=1, burst=2, now=1.0)[0]
+
+
+def test_memory_storage_is_bounded():
+    storage = MemoryStorage(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        storage.take(key, rate=1, burst=1, now=0)
+    assert list(storage._buckets) == ['b', 'c']
+
+
+def test_rest_ingest_is_throttled_after_burst(client, make_user):
+    _, headers = make_user()
+    fix = {'lat': 47.0, 'lng': 8.0}
+    statuses = [client.post('/api/locations', json=fix, headers=headers).status_code for _ in range(6)]
+    assert statuses == [201] * 5 + [429]
+    
+    metrics = client.get('/api/admin/metrics', headers=make_user('admin@example.com', role='admin')[1]).get_json()
+    assert metrics['rate_limit']['throttled']['rest_user'] == 1
+
+
+def test_ingest_is_shed_when_overloaded(client, make_user, monkeypatch):
+    _, headers = make_user()
+    monkeypatch.setattr(admission, 'max_in_flight', 1)
+    monkeypatch.setattr(admission, 'in_flight', 5)
+    response = client.post('/api/locations', json={'lat': 47.0, 'lng': 8.0}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_shared_storage_failure_falls_back_to_local_limits(client, make_user, monkeypatch):
+    class DownStorage:
+        def take(self, key, rate, burst):
+            raise ConnectionError('redis is down')
+    monkeypatch.setattr(rate_limit, 'STORAGE_ERRORS', (ConnectionError,))
+    monkeypatch.setattr(rate_limiter, 'storage', DownStorage())
+    _, headers = make_user()
+    
+    fix = {'lat': 47.0, 'lng': 8.0}
+    statuses = [client.post('/api/locations', json=fix, headers=headers).status_code for _ in range(6)]
+    assert statuses == [201] * 5 + [429]
+    assert rate_limiter.metrics()['storage_errors'] == 6
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from app import create_app, db
+from app.models.location import Location
+from app.services.replica import REPLICA_BIND, replica_router
+from tests.helpers import TestConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"}
+        REPLICA_CHECK_INTERVAL = 0
+    
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+    yield app
+    with app.app_context():
+        db.session.remove()
+
+
+def test_history_reads_come_from_replica(app, make_user):
+    user_id, headers = make_user()
+    with app.app_context():
+        with db.engines[REPLICA_BIND].begin() as conn:
+            conn.execute(Location.__table__.insert(), {'user_id': user_id, 'latitude': 1.0, 'longitude': 2.0})
+    
+    response = app.test_client().get(f'/api/locations/user/{user_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 1
+
+
+def test_lagging_replica_falls_back_to_primary(app, make_user, monkeypatch):
+    user_id, headers = make_user()
+    monkeypatch.setattr(replica_router, '_measure_lag', lambda engine: 60.0)
+    with app.app_context():
+        with db.engines[REPLICA_BIND].begin() as conn:
+            conn.execute(Location.__table__.insert(), {'user_id': user_id, 'latitude': 1.0, 'longitude': 2.0})
+    
+    response = app.test_client().get(f'/api/locations/user/{user_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 0
+    assert replica_router.metrics()['primary_fallbacks'] >= 1
+
+
+def test_slow_probe_does_not_block_other_reads(app, monkeypatch):
+    probing, release = threading.Event(), threading.Event()
+    def slow_lag(engine):
+        probing.set()
+        release.wait(5)
+        return 0.0
+    monkeypatch.setattr(replica_router, '_measure_lag', slow_lag)
+    def read():
+        with app.app_context():
+            replica_router.engine_for_reads(db)
+    
+    with app.app_context():
+        prober = threading.Thread(target=read)
+        prober.start()
+        assert probing.wait(5)
+        # The probe is in flight: other reads go to the primary without waiting for it
+        assert replica_router.engine_for_reads(db) is None
+        release.set()
+        prober.join(5)
+        assert replica_router.engine_for_reads(db) is db.engines[REPLICA_BIND]
+
+
+def test_interrupted_probe_does_not_disable_checks(app, monkeypatch):
+    class Interrupted(BaseException):
+        pass
+    def interrupted(engine):
+        raise Interrupted()
+    monkeypatch.setattr(replica_router, '_measure_lag', interrupted)
+    
+    with app.app_context():
+        with pytest.raises(Interrupted):
+            replica_router.engine_for_reads(db)
+        monkeypatch.setattr(replica_router, '_measure_lag', lambda engine: 0.0)
+        assert replica_router.engine_for_reads(db) is db.engines[REPLICA_BIND]
+
+
+def test_replica_is_chosen_once_per_request(app, make_user, monkeypatch):
+    user_id, headers = make_user()
+    calls = []
+    choose = replica_router.engine_for_reads
+    monkeypatch.setattr(replica_router, 'engine_for_reads', lambda db: calls.append(1) or choose(db))
+    
+    response = app.test_client().get(f'/api/locations/user/{user_id}', headers=headers)
+    assert response.status_code == 200
+    assert len(calls) == 1
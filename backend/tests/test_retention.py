@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.user import User
+from app.models.location import Location
+from app.models.group import GroupMembership
+from app.services.location_store import location_store
+from app.services.retention import purge_users, retention
+
+
+def _add_locations(user_id, count, start):
+    db.session.execute(db.insert(Location), [
+        {'user_id': user_id, 'latitude': 1.0, 'longitude': 2.0, 'timestamp': start + timedelta(hours=i)}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def test_delete_user_removes_locations_and_memberships(app, client, make_user):
+    _, admin = make_user('admin@example.com', role='admin')
+    alice_id, _ = make_user('alice@example.com')
+    group = client.post('/api/admin/groups', json={'name': 'Hikers'}, headers=admin).get_json()['group']['id']
+    client.put(f'/api/admin/groups/{group}/members/{alice_id}', headers=admin)
+    with app.app_context():
+        _add_locations(alice_id, 3, datetime.utcnow())
+    
+    response = client.delete(f'/api/admin/users/{alice_id}', headers=admin)
+    assert response.status_code == 200
+    with app.app_context():
+        assert Location.query.filter_by(user_id=alice_id).count() == 0
+        assert GroupMembership.query.filter_by(user_id=alice_id).count() == 0
+
+
+def test_retention_prunes_old_locations_and_expired_registrations(app, make_user):
+    now = datetime(2025, 6, 1)
+    alice_id, _ = make_user('alice@example.com')
+    with app.app_context():
+        _add_locations(alice_id, 5, now - timedelta(days=31, hours=3))
+        _add_locations(alice_id, 2, now - timedelta(days=1))
+        stale = User(name='stale', email='stale@example.com', password='x', is_verified=False,
+                     token_expiry=now - timedelta(days=10))
+        pending = User(name='pending', email='pending@example.com', password='x', is_verified=False,
+                       token_expiry=now - timedelta(days=1))
+        db.session.add_all([stale, pending])
+        db.session.commit()
+        _add_locations(stale.id, 2, now - timedelta(days=20))
+        
+        retention.location_days = 30
+        retention.chunk_size = 2
+        assert retention.run(now) == {'locations': 5, 'unverified_users': 1}
+        
+        assert Location.query.filter_by(user_id=alice_id).count() == 2
+        assert {user.email for user in User.query} == {'alice@example.com', 'pending@example.com'}
+        assert Location.query.count() == 2
+
+
+def test_purge_deletes_locations_of_all_users_at_once(app, make_user, monkeypatch):
+    alice_id, _ = make_user('alice@example.com')
+    bob_id, _ = make_user('bob@example.com')
+    carol_id, _ = make_user('carol@example.com')
+    notifications = []
+    with app.app_context():
+        for user_id in (alice_id, bob_id, carol_id):
+            _add_locations(user_id, 2, datetime.utcnow())
+        monkeypatch.setattr(location_store, '_listeners', [notifications.append])
+        
+        assert purge_users([alice_id, bob_id]) == 2
+        db.session.commit()
+        assert notifications == [None]
+        assert {location.user_id for location in Location.query} == {carol_id}
+
+
+def test_create_schema_adds_missing_location_indexes(app):
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ix_locations_timestamp'))
+        db.session.commit()
+        app.test_cli_runner().invoke(args=['create-schema'])
+        indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('locations')}
+    assert {'ix_locations_timestamp', 'ix_locations_user_id'} <= indexes
@@ -0,0 +1,55 @@
+from flask_jwt_extended import create_access_token
+
+from app import socketio
+from app.services.broadcast import RoomLog
+
+
+class FakeSocketIO:
+    def emit(self, *args, **kwargs):
+        pass
+
+
+def test_room_log_replays_only_missed_messages():
+    log = RoomLog(maxlen=3)
+    for i in range(3):
+        log.publish(FakeSocketIO(), 'all_users', 'location_update', {'n': i})
+    
+    missed, complete = log.since('all_users', 1)
+    assert complete
+    assert [message['n'] for _, message in missed] == [1, 2]
+
+
+def test_room_log_requires_resync_after_buffer_overflow():
+    log = RoomLog(maxlen=2)
+    for i in range(5):
+        log.publish(FakeSocketIO(), 'all_users', 'location_update', {'n': i})
+    
+    assert not log.since('all_users', 2)[1]
+    assert log.since('all_users', 3)[1]
+    assert not log.since('all_users', 9)[1]
+
+
+def test_reconnecting_client_resumes_missed_updates(app, make_user):
+    app.config['SOCKET_RESUME_GRACE'] = 0
+    watcher_id, _ = make_user('watcher@example.com')
+    rider_id, _ = make_user('rider@example.com')
+    with app.app_context():
+        watcher_token = create_access_token(identity=str(watcher_id))
+        rider_token = create_access_token(identity=str(rider_id))
+    
+    watcher = socketio.test_client(app, query_string=f'token={watcher_token}')
+    rider = socketio.test_client(app, query_string=f'token={rider_token}')
+    rider.emit('update_location', {'lat': 1.0, 'lng': 2.0})
+    session = watcher.emit('resume', {}, callback=True)
+    last_seq = session['rooms']['all_users']['seq']
+    watcher.disconnect()
+    
+    rider.emit('update_location', {'lat': 1.1, 'lng': 2.1})
+    rider.emit('update_location', {'lat': 1.2, 'lng': 2.2})
+    
+    watcher = socketio.test_client(app, query_string=f'token={watcher_token}')
+    ack = watcher.emit('resume', {'epoch': session['epoch'], 'seqs': {'all_users': last_seq}}, callback=True)
+    assert ack['rooms']['all_users'] == {'replayed': 2, 'resync': False, 'seq': last_seq + 2}
+    
+    stale = watcher.emit('resume', {'epoch': 'restarted', 'seqs': {'all_users': last_seq}}, callback=True)
+    assert stale['rooms']['all_users']['resync'] is True
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys
+from app import create_app
+class Config:
+    SECRET_KEY = 'probe'
+    JWT_SECRET_KEY = 'probe-jwt-secret-key-long-enough-for-hs256'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    AUTO_CREATE_SCHEMA = False
+create_app(Config)
+print(sorted(name for name in ('flask_migrate', 'app.services.email') if name in sys.modules))
+"""
+
+
+def test_serving_workers_skip_cli_only_subsystems(client, make_user):
+    # A fresh interpreter: other tests in this process may have imported them
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+    
+    _, headers = make_user('admin@example.com', role='admin')
+    startup = client.get('/api/admin/metrics', headers=headers).get_json()['startup']
+    assert {'imports', 'extensions', 'blueprints'} <= set(startup['phases'])
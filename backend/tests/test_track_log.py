@@ -0,0 +1,122 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, db
+from app.services.retention import purge_users
+from app.services.track_log import TrackLogRepository
+from tests.helpers import TestConfig
+
+START = datetime(2025, 6, 1, 8, 0, 0)
+
+
+def _rows(user_id, count):
+    return [{
+        'user_id': user_id,
+        'latitude': 47.0 + i * 0.001,
+        'longitude': 8.0,
+        'speed': float(i) if i % 2 else None,
+        'timestamp': START + timedelta(seconds=i)
+    } for i in range(count)]
+
+
+def test_segments_roll_and_range_queries_use_time_bounds(tmp_path):
+    repo = TrackLogRepository(str(tmp_path), segment_records=4)
+    repo.add_many(_rows(1, 10))
+    
+    segments = repo.segments(1)
+    assert [count for *_, count in segments] == [4, 4, 2]
+    assert (tmp_path / '1' / 'index.json').exists()
+    
+    points = list(repo.iter_range(1, START + timedelta(seconds=3), START + timedelta(seconds=5)))
+    assert [p.timestamp.second for p in points] == [3, 4, 5]
+    assert points[0].speed == 3.0 and points[1].speed is None
+
+
+def test_history_pages_newest_first(tmp_path):
+    repo = TrackLogRepository(str(tmp_path), segment_records=4)
+    repo.add_many(_rows(1, 10))
+    
+    items, total = repo.history(1, page=2, per_page=3)
+    assert total == 10
+    assert [p.id for p in items] == [7, 6, 5]
+    assert repo.latest(1).timestamp == START + timedelta(seconds=9)
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TrackLogConfig(TestConfig):
+        LOCATION_BACKEND = 'tracklog'
+        TRACKLOG_DIR = str(tmp_path / 'tracklog')
+        RATELIMIT_ENABLED = False
+    return create_app(TrackLogConfig)
+
+
+def test_endpoints_read_from_track_log(client, make_user):
+    user_id, headers = make_user()
+    for lat in (47.0, 47.01, 47.02):
+        assert client.post('/api/locations', json={'lat': lat, 'lng': 8.0}, headers=headers).status_code == 201
+    
+    history = client.get(f'/api/locations/user/{user_id}?per_page=2', headers=headers).get_json()
+    assert history['total'] == 3 and history['pages'] == 2
+    assert [l['latitude'] for l in history['locations']] == [47.02, 47.01]
+    
+    stats = client.get(f'/api/locations/user/{user_id}/stats', headers=headers).get_json()
+    assert stats['count'] == 3
+    assert stats['distance_km'] == pytest.approx(2.22, abs=0.01)
+    
+    export = client.get(f'/api/locations/user/{user_id}/export', headers=headers)
+    lines = export.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('timestamp,latitude')
+    assert len(lines) == 4
+
+
+def test_prune_drops_only_whole_expired_segments(tmp_path):
+    repo = TrackLogRepository(str(tmp_path), segment_records=4)
+    repo.add_many(_rows(1, 10))
+    
+    assert repo.prune(START + timedelta(seconds=6)) == 4
+    assert [count for *_, count in repo.segments(1)] == [4, 2]
+    assert repo.history(1, page=1, per_page=20)[1] == 6
+    
+    repo.delete_user(1)
+    assert repo.segments(1) == []
+
+
+def test_failed_index_write_is_tolerated(tmp_path, monkeypatch):
+    repo = TrackLogRepository(str(tmp_path), segment_records=4)
+    repo.add_many(_rows(1, 6))
+    def fail(src, dst):
+        raise PermissionError(dst)
+    monkeypatch.setattr('app.services.track_log.os.replace', fail)
+    
+    assert [count for *_, count in repo.segments(1)] == [4, 2]
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path / '1'))
+
+
+def test_purged_history_is_removed_only_when_the_purge_commits(app, make_user):
+    user_id, headers = make_user()
+    client = app.test_client()
+    assert client.post('/api/locations', json={'lat': 47.0, 'lng': 8.0}, headers=headers).status_code == 201
+    user_dir = os.path.join(app.config['TRACKLOG_DIR'], str(user_id))
+    
+    with app.app_context():
+        purge_users([user_id])
+        assert os.path.isdir(user_dir)
+        db.session.rollback()
+        assert os.path.isdir(user_dir)
+        
+        purge_users([user_id])
+        db.session.commit()
+        assert not os.path.exists(user_dir)
+
+
+def test_time_range_accepts_utc_designator(client, make_user):
+    user_id, headers = make_user()
+    assert client.post('/api/locations', json={'lat': 47.0, 'lng': 8.0}, headers=headers).status_code == 201
+    
+    for start, count in (('2024-01-01T00:00:00Z', 1), ('2999-01-01T00:00:00Z', 0)):
+        response = client.get(f'/api/locations/user/{user_id}/stats?start={start}', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['count'] == count
@@ -0,0 +1,49 @@
+from app.services.user_cache import UserCache, user_cache
+
+
+class CountingCache(UserCache):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loads = []
+    
+    def _load(self, user_id):
+        self.loads.append(user_id)
+        return ('user', user_id)
+
+
+def test_cache_hits_until_ttl_expires(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr('app.services.user_cache.time.monotonic', lambda: clock[0])
+    cache = CountingCache(ttl=10)
+    
+    cache.get('1')
+    cache.get(1)
+    assert cache.loads == [1]
+    
+    clock[0] += 11
+    cache.get(1)
+    assert cache.loads == [1, 1]
+    assert cache.metrics()['expirations'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = CountingCache(maxsize=2)
+    cache.get(1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)
+    
+    cache.get(1)
+    cache.get(2)
+    assert cache.loads == [1, 2, 3, 2]
+    assert cache.metrics()['evictions'] == 2
+
+
+def test_admin_toggle_invalidates_cached_user(client, make_user):
+    _, admin_headers = make_user('admin@example.com', role='admin')
+    user_id, headers = make_user('rider@example.com')
+    
+    assert client.get('/api/users/me', headers=headers).get_json()['is_active'] is True
+    client.put(f'/api/admin/users/{user_id}/toggle-active', headers=admin_headers)
+    assert client.get('/api/users/me', headers=headers).get_json()['is_active'] is False
+    assert user_cache.metrics()['hits'] == 0
@@ -26,6 +26,12 @@ export const useLocationStore = defineStore('location', {
     trackingInterval: null,
     userLocations: {}, // Other users' locations: { userId: { lat, lng, timestamp } }
     watchedUserId: null, // Currently watched user ID
+    throttledUntil: 0, // Server asked us to pause updates until this time (ms)
+    broadcastEpoch: null, // Server broadcast epoch, changes when the worker restarts
+    broadcastSeqs: {}, // Last seen broadcast sequence number per room
+    resyncCount: 0, // Bumped when missed updates could not be replayed
+    reportInterval: 30, // Seconds between position reports, as hinted by the server
+    lastSentAt: 0, // When we last sent our position (ms)
     trackingError: null
   }),
   
@@ -50,17 +56,56 @@ export const useLocationStore = defineStore('location', {
       })
       this.socket.on('connect', () => {
         console.log('Socket connected')
+        this.resumeSession()
       })
       // Listen for location updates from other users
       this.socket.on('location_update', (data) => {
         const { userId, lat, lng, timestamp } = data
         this.userLocations[userId] = { lat, lng, timestamp }
+        this.trackBroadcast(data)
+      })
+      // Our group memberships changed: drop what we may no longer see and reload
+      this.socket.on('resync', () => {
+        this.userLocations = {}
+        this.broadcastSeqs = {}
+        this.resumeSession()
+        this.resyncCount++
+      })
+      // Server recommends how often to report, based on who is watching and how we move
+      this.socket.on('rate_hint', (data) => this.applyRateHint(data))
+      // Back off when the server rate limits or sheds our updates
+      this.socket.on('throttled', (data) => {
+        this.throttledUntil = Date.now() + (data.retry_after || 1) * 1000
       })
       this.socket.on('disconnect', () => {
         console.log('Socket disconnected')
       })
     },
     
+    // Ask the server to replay broadcasts missed while disconnected
+    resumeSession() {
+      const payload = { epoch: this.broadcastEpoch, seqs: this.broadcastSeqs }
+      this.socket.emit('resume', payload, (summary) => {
+        if (!summary) return
+        const needsResync = Object.values(summary.rooms).some(room => room.resync)
+        this.broadcastEpoch = summary.epoch
+        for (const [room, state] of Object.entries(summary.rooms)) {
+          this.broadcastSeqs[room] = Math.max(this.broadcastSeqs[room] || 0, state.seq)
+          if (state.resync) this.broadcastSeqs[room] = state.seq
+        }
+        if (needsResync) this.resyncCount++
+      })
+    },
+    
+    trackBroadcast({ room, seq, epoch }) {
+      if (!room || !seq) return
+      if (epoch !== this.broadcastEpoch) {
+        this.broadcastEpoch = epoch
+        this.broadcastSeqs = {}
+      }
+      this.broadcastSeqs[room] = Math.max(this.broadcastSeqs[room] || 0, seq)
+    },
+    
     async startTracking() {
       if (this.trackingActive) return
       
@@ -84,13 +129,7 @@ export const useLocationStore = defineStore('location', {
         )
         
         // Set up tracking interval (backup for when watchPosition is unreliable)
-        this.trackingInterval = setInterval(() => {
-          navigator.geolocation.getCurrentPosition(
-            position => this.updatePosition(position),
-            error => this.handlePositionError(error),
-            { enableHighAccuracy: true }
-          )
-        }, 30000) // Backup every 30 seconds
+        this.startBackupInterval()
         
         this.trackingActive = true
       } catch (error) {
@@ -99,6 +138,27 @@ export const useLocationStore = defineStore('location', {
       }
     },
     
+    startBackupInterval() {
+      if (this.trackingInterval) {
+        clearInterval(this.trackingInterval)
+      }
+      this.trackingInterval = setInterval(() => {
+        navigator.geolocation.getCurrentPosition(
+          position => this.updatePosition(position, true),
+          error => this.handlePositionError(error),
+          { enableHighAccuracy: true }
+        )
+      }, this.reportInterval * 1000) // Backup at the hinted reporting interval
+    },
+    
+    applyRateHint(hint) {
+      if (!hint || !hint.interval || hint.interval === this.reportInterval) return
+      this.reportInterval = hint.interval
+      if (this.trackingInterval) {
+        this.startBackupInterval()
+      }
+    },
+    
     stopTracking() {
       if (this.watchId !== null) {
         navigator.geolocation.clearWatch(this.watchId)
@@ -113,22 +173,31 @@ export const useLocationStore = defineStore('location', {
       this.trackingActive = false
     },
     
-    updatePosition(position) {
-      const { latitude, longitude, accuracy, timestamp } = position.coords
+    updatePosition(position, force = false) {
+      const { latitude, longitude, accuracy, speed, timestamp } = position.coords
       
       this.currentPosition = {
         lat: latitude,
         lng: longitude,
         accuracy,
+        speed,
         timestamp
       }
       
+      // Respect server back-off requests
+      if (Date.now() < this.throttledUntil) return
+      
+      // Don't report more often than the server recommends
+      if (!force && Date.now() - this.lastSentAt < this.reportInterval * 1000) return
+      this.lastSentAt = Date.now()
+      
       // Send position to the server
       if (this.socket && this.socket.connected) {
         this.socket.emit('update_location', {
           lat: latitude,
           lng: longitude,
           accuracy,
+          speed,
           timestamp
         })
       } else {
@@ -142,7 +211,7 @@ export const useLocationStore = defineStore('location', {
       if (!this.currentPosition) return
       
       try {
-        const { lat, lng, accuracy, timestamp } = this.currentPosition
+        const { lat, lng, accuracy, speed, timestamp } = this.currentPosition
         // Use fetch to demonstrate runtime config usage
         const url = (runtimeConfig.backendUrl || '') + '/api/locations'
         const token = localStorage.getItem('token')
@@ -152,9 +221,11 @@ export const useLocationStore = defineStore('location', {
             'Content-Type': 'application/json',
             ...(token ? { 'Authorization': `Bearer ${token}` } : {})
           },
-          body: JSON.stringify({ lat, lng, accuracy, timestamp })
+          body: JSON.stringify({ lat, lng, accuracy, speed, timestamp })
         })
         if (!res.ok) throw new Error('Network error')
+        const body = await res.json()
+        this.applyRateHint(body.rate_hint)
       } catch (error) {
         console.error('Failed to send location via API:', error)
       }